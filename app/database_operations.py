@@ -1,5 +1,6 @@
 import streamlit as st
 from utils.database import HistoryDatabase
+from utils.job_queue import JobQueue
 
 
 @st.cache_resource
@@ -8,6 +9,12 @@ def get_database():
     return HistoryDatabase()
 
 
+@st.cache_resource
+def get_job_queue():
+    """Get or create the background job queue shared by all sessions"""
+    return JobQueue()
+
+
 def load_history_entry(db, entry_id):
     """Load a history entry from the database"""
     entry = db.get_entry(entry_id)
@@ -15,11 +22,17 @@ def load_history_entry(db, entry_id):
         # Map column indices to variables
         id, input_text, simplified_text, translated_text, language, timestamp, title = entry
         st.session_state.input_text = input_text
+        st.session_state.input_segments = None
         st.session_state.simplified_text = simplified_text or ""
         st.session_state.translated_text = translated_text or ""
         st.session_state.current_entry_id = id
         st.session_state.selected_language = language or "None"
 
+        # Entries translated before translations were stored per language
+        st.session_state.translations = db.get_translations(id)
+        if language and translated_text and language not in st.session_state.translations:
+            st.session_state.translations[language] = translated_text
+
 
 def perform_delete(db):
     """Delete an entry from the database"""
@@ -1,34 +1,141 @@
 import streamlit as st
 import asyncio
-from utils.Simplification import simplify_document
-from utils.translation import translate_text
+import os
+import time
+from app.database_operations import get_job_queue, load_history_entry
+from utils.chunking import split_into_segments
+from utils.extraction_cache import get_extraction_cache
+from utils.file_extractor import expand_archives
+from utils.job_queue import DONE, FAILED
+from utils.translation import TRANSLATION_LANGUAGES, translate_to_languages, translate_text
+from utils.ollama_config import get_selected_model
+
+
+def _pipeline_language():
+    """Language to translate into while simplifying, or None"""
+    pipeline_language = st.session_state.pipeline_language
+    return pipeline_language if pipeline_language in TRANSLATION_LANGUAGES else None
 
 
 def process_simplification(db, user_input):
-    """Process the simplification of legal text"""
+    """Queue the simplification of legal text as a background job"""
     if user_input.strip() == "":
         st.error("Please enter some text to simplify.")
         return False
 
-    with st.spinner("Simplifying..."):
-        simplified_text = simplify_document(user_input)
-        st.session_state.simplified_text = simplified_text
+    # The job writes its result into a history entry, so create one up front
+    if not st.session_state.current_entry_id:
+        entry_id = db.add_entry(user_input)
+        st.session_state.current_entry_id = entry_id
+
+    # Text used unedited from an uploaded file keeps the segments its extractor found
+    segments = st.session_state.input_segments if user_input == st.session_state.input_text else None
+
+    # Optionally translate each paragraph of the summary as soon as it is generated
+    get_job_queue().submit_simplification(
+        st.session_state.current_entry_id, user_input, get_selected_model(),
+        prefilter=st.session_state.prefilter_input,
+        translate_to=_pipeline_language(),
+        segments=segments)
+
+    # Clear translated text since new simplified text is on the way
+    st.session_state.translated_text = ""
+    st.session_state.translations = {}
+    return True
+
+
+def process_uploaded_files(db, uploaded_files):
+    """
+    Extract several uploaded files and ZIP archives and queue one simplification job per document.
+
+    Files are extracted concurrently; each document becomes its own history entry.
+    """
+    files = expand_archives([(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files])
+    if not files:
+        st.error("No .txt, .docx or .pdf documents were found in the upload.")
+        return False
+
+    started = time.time()
+    progress = st.progress(0.0, text=f"Extracting text from {len(files)} documents...")
+    results = [None] * len(files)
+    for done, (index, result) in enumerate(get_extraction_cache().extract_many(files), start=1):
+        results[index] = result
+        progress.progress(done / len(files), text=f"Extracted {done} of {len(files)}: {files[index][0]}")
+
+    queue = get_job_queue()
+    model = get_selected_model()
+    batch_jobs = []
+    for (file_name, _), result in zip(files, results):
+        text = result.text if result else None
+        if not text or not text.strip():
+            batch_jobs.append({"name": file_name, "entry_id": None, "job_id": None})
+            continue
+
+        entry_id = db.add_entry(text, title=os.path.basename(file_name))
+        job_id = queue.submit_simplification(
+            entry_id, text, model,
+            prefilter=st.session_state.prefilter_input,
+            translate_to=_pipeline_language(),
+            segments=split_into_segments(result.segments))
+        batch_jobs.append({"name": file_name, "entry_id": entry_id, "job_id": job_id})
 
-        # Save to database
-        if st.session_state.current_entry_id:
-            # Update existing entry
-            db.update_entry(
-                st.session_state.current_entry_id,
-                simplified_text=simplified_text
+    st.session_state.batch_jobs = batch_jobs
+    st.session_state.batch_extraction = {
+        "files": len(files),
+        "bytes": sum(len(file_bytes) for _, file_bytes in files),
+        "seconds": time.time() - started,
+    }
+    return True
+
+
+def finish_simplification_job(db, job_id):
+    """Show the result of a finished simplification job in the current session"""
+    st.session_state.watched_job_id = None
+    job = get_job_queue().get_job(job_id)
+    if job is None:
+        return
+
+    if job["status"] == FAILED:
+        st.session_state.job_error = job["error"]
+    elif job["status"] == DONE and job["entry_id"] == st.session_state.current_entry_id:
+        # The worker already saved the result to the history database
+        load_history_entry(db, job["entry_id"])
+        stats = job["clause_stats"]
+        if stats and stats["reused"]:
+            st.toast(
+                f"Document simplified successfully! Reused {stats['reused']} of {stats['clauses']} "
+                f"clauses from earlier documents, saving about {stats['seconds_saved']:.0f}s."
             )
         else:
-            # Create new entry
-            entry_id = db.add_entry(user_input, simplified_text)
-            st.session_state.current_entry_id = entry_id
+            st.toast("Document simplified successfully!")
+        if job["error"]:
+            # The simplification was saved but translating it failed
+            st.toast(job["error"])
 
-        # Clear translated text since we have new simplified text
-        st.session_state.translated_text = ""
-        return True
+
+def _store_translation(db, language, translated_text):
+    """Keep a successful translation in the session and the entry's translations"""
+    if translated_text.startswith("Error in translation:"):
+        return False
+
+    st.session_state.translations[language] = translated_text
+    if st.session_state.current_entry_id:
+        db.save_translation(st.session_state.current_entry_id, language, translated_text)
+    return True
+
+
+def show_translation(db, language):
+    """Show a stored translation and remember it as the entry's selected language"""
+    st.session_state.translated_text = st.session_state.translations[language]
+    st.session_state.selected_language = language
+
+    # Update in database
+    if st.session_state.current_entry_id:
+        db.update_entry(
+            st.session_state.current_entry_id,
+            translated_text=st.session_state.translated_text,
+            language=language
+        )
 
 
 def process_translation(db, lang_code, language):
@@ -38,14 +145,38 @@ def process_translation(db, lang_code, language):
             translate_text(
                 st.session_state.simplified_text, src="en", dest=lang_code)
         )
-        st.session_state.translated_text = translated_text
-        st.session_state.selected_language = language
-
-        # Update in database
-        if st.session_state.current_entry_id:
-            db.update_entry(
-                st.session_state.current_entry_id,
-                translated_text=translated_text,
-                language=language
-            )
+        if _store_translation(db, language, translated_text):
+            show_translation(db, language)
+        else:
+            st.session_state.translated_text = translated_text
+            st.session_state.selected_language = language
         return True
+
+
+def process_translation_all(db, selected_language):
+    """Translate the simplified text into every language at the same time"""
+    pending = {language: code for language, code in TRANSLATION_LANGUAGES.items()
+               if language not in st.session_state.translations}
+    if not pending:
+        return False
+
+    with st.spinner(f"Translating to {', '.join(pending)}..."):
+        translations = asyncio.run(translate_to_languages(
+            st.session_state.simplified_text, list(pending.values())))
+
+        failed = [
+            f"{language}: {translations[code].removeprefix('Error in translation: ')}"
+            for language, code in pending.items()
+            if not _store_translation(db, language, translations[code])
+        ]
+
+    if failed:
+        # Shown after the rerun, which clears anything shown now
+        st.session_state.translation_error = "; ".join(failed)
+
+    # Show the language picked in the selector, or the first one translated
+    language = selected_language if selected_language in st.session_state.translations \
+        else next(iter(st.session_state.translations), None)
+    if language:
+        show_translation(db, language)
+    return True
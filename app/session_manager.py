@@ -6,12 +6,16 @@ def initialize_session_state():
     """Initialize session state variables"""
     if "input_text" not in st.session_state:
         st.session_state.input_text = ""
+    if "input_segments" not in st.session_state:
+        st.session_state.input_segments = None
     if "simplified_text" not in st.session_state:
         st.session_state.simplified_text = ""
     if "translated_text" not in st.session_state:
         st.session_state.translated_text = ""
     if "selected_language" not in st.session_state:
         st.session_state.selected_language = "None"
+    if "translations" not in st.session_state:
+        st.session_state.translations = {}
     if "current_entry_id" not in st.session_state:
         st.session_state.current_entry_id = None
     if "show_delete_dialog" not in st.session_state:
@@ -27,15 +31,38 @@ def initialize_session_state():
         st.session_state.ollama_model = DEFAULT_MODEL
     if "doc_title" not in st.session_state:
         st.session_state.doc_title = ""
+    if "stream_output" not in st.session_state:
+        st.session_state.stream_output = True
+    if "prefilter_input" not in st.session_state:
+        st.session_state.prefilter_input = False
+    if "pipeline_language" not in st.session_state:
+        st.session_state.pipeline_language = "Off"
+    if "job_error" not in st.session_state:
+        st.session_state.job_error = None
+    if "translation_error" not in st.session_state:
+        st.session_state.translation_error = None
+    if "watched_job_id" not in st.session_state:
+        st.session_state.watched_job_id = None
+    if "batch_jobs" not in st.session_state:
+        st.session_state.batch_jobs = []
+    if "batch_extraction" not in st.session_state:
+        st.session_state.batch_extraction = None
 
 
 def reset_session():
     """Reset the current session data"""
     st.session_state.input_text = ""
+    st.session_state.input_segments = None
     st.session_state.simplified_text = ""
     st.session_state.translated_text = ""
     st.session_state.current_entry_id = None
     st.session_state.selected_language = "None"
+    st.session_state.translations = {}
+    st.session_state.job_error = None
+    st.session_state.translation_error = None
+    st.session_state.watched_job_id = None
+    st.session_state.batch_jobs = []
+    st.session_state.batch_extraction = None
 
 
 def set_delete_dialog(show=False, entry_id=None):
@@ -1,12 +1,38 @@
 import streamlit as st
 from app.session_manager import set_delete_dialog, reset_session
-from app.database_operations import load_history_entry, perform_delete
-from app.processors import process_simplification, process_translation
-from utils.ollama_config import AVAILABLE_MODELS, get_selected_model, set_selected_model
+from app.database_operations import get_job_queue, load_history_entry, perform_delete
+from app.processors import (
+    finish_simplification_job,
+    process_simplification,
+    process_uploaded_files,
+    process_translation,
+    process_translation_all,
+    show_translation,
+)
+from utils.ollama_config import (
+    AVAILABLE_MODELS,
+    PREFILTER_TOKEN_BUDGET,
+    get_selected_model,
+    set_selected_model,
+)
 from utils.Simplification import check_model_availability
-from utils.file_extractor import extract_text_from_file
+from utils.result_cache import get_result_cache
+from utils.clause_index import get_clause_index
+from utils.translation_memory import get_translation_memory
+from utils.translation import TRANSLATION_LANGUAGES
+from utils.single_flight import inflight
+from utils.warmup import get_model_warmup
+from utils.host_pool import get_host_pool
+from utils.model_registry import get_model_registry
+from utils.extraction_cache import get_extraction_cache
 from utils.document_export import DocumentExporter
+from utils.job_queue import QUEUED, RUNNING, DONE, FAILED
+from utils.chunking import estimate_tokens, split_into_segments
 from datetime import datetime
+import time
+
+# Seconds between status polls while a simplification job is running
+JOB_POLL_INTERVAL = 1
 
 
 def render_delete_dialog(db):
@@ -80,23 +106,43 @@ def render_input_area(db):
         # Update session state when input changes
         if user_input != st.session_state.input_text:
             st.session_state.input_text = user_input
+            st.session_state.input_segments = None
             
     with file_tab:
-        # Add file uploader for document files
-        uploaded_file = st.file_uploader(
-            "Upload a legal document file:",
-            type=["txt", "docx", "pdf"],
+        # Add file uploader for document files and archives of them
+        uploaded_files = st.file_uploader(
+            "Upload legal document files or ZIP archives:",
+            type=["txt", "docx", "pdf", "zip"],
+            accept_multiple_files=True,
             key="file_uploader"
         )
-        
-        # Extract text when file is uploaded
+        uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+        if uploaded_file is not None and uploaded_file.name.lower().endswith(".zip"):
+            uploaded_file = None
+
+        # Several files are each simplified as their own document
+        if uploaded_files and uploaded_file is None:
+            st.caption(f"{len(uploaded_files)} file(s) uploaded; each document gets its own history entry")
+            if st.button("Simplify All Documents", key="simplify_all"):
+                if process_uploaded_files(db, uploaded_files):
+                    st.rerun()
+
+        # Extract text when a single file is uploaded
         if uploaded_file is not None:
-            # Show a spinner while extracting text
+            # Show a spinner while extracting text; files seen before come from the cache
             with st.spinner(f"Extracting text from {uploaded_file.name}..."):
-                extracted_text = extract_text_from_file(uploaded_file)
+                extraction = get_extraction_cache().extract(
+                    uploaded_file.getvalue(), uploaded_file.name, uploaded_file.type)
+                extracted_text = extraction.text if extraction else None
                 
                 if extracted_text:
                     st.success(f"Text extracted from {uploaded_file.name}")
+                    pages = {segment.page for segment in extraction.segments if segment.page}
+                    st.caption(
+                        f"{len(extraction.segments)} paragraphs"
+                        + (f" on {len(pages)} pages" if pages else "")
+                        + f", {len(extraction.headings())} headings"
+                    )
                     
                     # Show preview with option to edit
                     st.markdown("### Preview Extracted Text")
@@ -110,6 +156,9 @@ def render_input_area(db):
                     # Update session state with extracted/edited text
                     if st.button("Use This Text", key="use_extracted"):
                         st.session_state.input_text = edited_text
+                        # Edited text no longer matches the extracted segments
+                        st.session_state.input_segments = split_into_segments(extraction.segments) \
+                            if edited_text == extracted_text else None
                         st.rerun()
     
     # Only show simplify button if there's input text (from either source)
@@ -125,10 +174,14 @@ def render_input_area(db):
         if title != st.session_state.doc_title:
             st.session_state.doc_title = title
             
+        # Only one job at a time per entry
+        active_job = (get_job_queue().get_active_job(st.session_state.current_entry_id)
+                      if st.session_state.current_entry_id else None)
+
         # Add button to simplify the text - FIX: Add user_input parameter
-        if st.button("Simplify Document", key="simplify_btn"):
+        if st.button("Simplify Document", key="simplify_btn", disabled=active_job is not None):
             if process_simplification(db, st.session_state.input_text):
-                st.success("Document simplified successfully!")
+                st.rerun()
     
     # Add a button to clear the current session
     if st.session_state.input_text:
@@ -139,9 +192,114 @@ def render_input_area(db):
     return user_input
 
 
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_job_progress(db, job_id):
+    """Poll a simplification job, showing partial output until it finishes"""
+    job = get_job_queue().get_job(job_id)
+
+    if job and job["status"] in (QUEUED, RUNNING):
+        if job["status"] == QUEUED:
+            st.caption("Waiting for a free worker...")
+        else:
+            st.caption("Simplifying...")
+        if st.session_state.stream_output and job["partial_text"]:
+            st.write(job["partial_text"])
+        if st.session_state.stream_output and job["partial_translation"]:
+            st.markdown(f"### Translated Text ({job['translate_to']}):")
+            st.write(job["partial_translation"])
+        return
+
+    # The job has finished: rerun the app so the output area shows its result
+    st.rerun()
+
+
+def _status_label(job):
+    """Short status of a batch document's job"""
+    if job is None:
+        return "Failed to extract"
+    return {
+        QUEUED: "Queued",
+        RUNNING: "Simplifying",
+        DONE: "Done" if not job["error"] else f"Done ({job['error']})",
+        FAILED: f"Failed: {job['error']}",
+    }.get(job["status"], job["status"])
+
+
+def render_batch_status():
+    """
+    Show the status of each document of the last multi-file upload and the combined throughput.
+
+    Returns:
+        bool: True while any document is still queued or being simplified
+    """
+    queue = get_job_queue()
+    items = st.session_state.batch_jobs
+    jobs = [queue.get_job(item["job_id"]) if item["job_id"] else None for item in items]
+    finished = [job for job in jobs if job and job["status"] in (DONE, FAILED)]
+    simplified = [job for job in finished if job["status"] == DONE]
+    queued = [job for job in jobs if job]
+
+    st.progress(len(finished) / len(queued) if queued else 1.0,
+                text=f"{len(finished)} of {len(queued)} documents finished")
+    st.table([{"Document": item["name"], "Status": _status_label(job)} for item, job in zip(items, jobs)])
+
+    extraction = st.session_state.batch_extraction
+    if extraction:
+        st.caption(
+            f"Extracted {extraction['files']} documents ({extraction['bytes'] / (1024 * 1024):.1f} MB) "
+            f"in {extraction['seconds']:.1f}s"
+        )
+
+    # Throughput from the first job queued to the last one finished, or now while jobs run
+    active = len(finished) < len(queued)
+    if simplified:
+        end = time.time() if active else max(job["updated"] for job in finished)
+        elapsed = max(end - min(job["created"] for job in queued), 1e-6)
+        tokens = sum(estimate_tokens(job["input_text"]) for job in simplified)
+        st.caption(
+            f"{len(simplified) / elapsed * 60:.1f} documents/minute, "
+            f"{tokens / elapsed:.0f} input tokens/second"
+        )
+    return active
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_batch_progress():
+    """Poll the jobs of a multi-file upload until all of them finish"""
+    if not render_batch_status():
+        # Rerun the app so the history sidebar lists the finished documents
+        st.rerun()
+
+
 def render_output_area(db):
     """Render the output area with simplified and translated text"""
-    if st.session_state.simplified_text:
+    if st.session_state.batch_jobs:
+        st.markdown("### Uploaded Documents:")
+        queue = get_job_queue()
+        if any(item["job_id"] and queue.get_job(item["job_id"])["status"] in (QUEUED, RUNNING)
+               for item in st.session_state.batch_jobs):
+            render_batch_progress()
+        else:
+            render_batch_status()
+
+    # Jobs keep running in the background while the user navigates
+    active_job = (get_job_queue().get_active_job(st.session_state.current_entry_id)
+                  if st.session_state.current_entry_id else None)
+
+    if active_job:
+        st.session_state.watched_job_id = active_job["id"]
+    elif st.session_state.watched_job_id:
+        finish_simplification_job(db, st.session_state.watched_job_id)
+
+    if st.session_state.job_error:
+        st.error(f"Error during simplification: {st.session_state.job_error}")
+        st.session_state.job_error = None
+
+    if active_job:
+        st.markdown("### Simplified Text:")
+        render_job_progress(db, active_job["id"])
+
+    elif st.session_state.simplified_text:
         st.markdown("### Simplified Text:")
         st.write(st.session_state.simplified_text)
 
@@ -149,24 +307,38 @@ def render_output_area(db):
         st.session_state.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # Language selection and translation
+        languages = ["None", *TRANSLATION_LANGUAGES]
         language = st.selectbox(
             "Translate to:",
-            ["None", "Hindi", "Marathi"],
-            index=["None", "Hindi", "Marathi"].index(
-                st.session_state.selected_language)
-            if st.session_state.selected_language in ["None", "Hindi", "Marathi"] else 0,
+            languages,
+            index=languages.index(st.session_state.selected_language)
+            if st.session_state.selected_language in languages else 0,
             key="lang_select"
         )
 
+        # Languages translated before are shown without another request
+        if language in st.session_state.translations and language != st.session_state.selected_language:
+            show_translation(db, language)
+
+        if st.session_state.translation_error:
+            st.error(f"Error during translation: {st.session_state.translation_error}")
+            st.session_state.translation_error = None
+
         col1, col2 = st.columns([1, 1])
 
         with col1:
-            if language != "None":
-                lang_code = "hi" if language == "Hindi" else "mr"
+            if language != "None" and language not in st.session_state.translations:
+                lang_code = TRANSLATION_LANGUAGES[language]
                 if st.button("Translate"):
                     if process_translation(db, lang_code, language):
                         st.rerun()
 
+        with col2:
+            if len(st.session_state.translations) < len(TRANSLATION_LANGUAGES):
+                if st.button("Translate to All", key="translate_all"):
+                    if process_translation_all(db, language):
+                        st.rerun()
+
         # Add export options
         # with col2:
         #     if st.button("Export Document"):
@@ -262,10 +434,6 @@ def render_export_options(db):
 
 def render_model_selection():
     """Render a dropdown to select the Ollama model"""
-    import requests
-    import json
-    from utils.ollama_config import OLLAMA_API_HOST
-
     # Check if the "Advanced" button has been clicked
     if "show_advanced" not in st.session_state:
         st.session_state.show_advanced = False
@@ -281,36 +449,30 @@ def render_model_selection():
         # Display available models first
         st.sidebar.markdown("#### Available Models")
 
-        try:
-            # Get the list of available models from Ollama
-            api_host = OLLAMA_API_HOST.replace("http://", "")
-            response = requests.get(f"http://{api_host}/api/tags")
-
-            if response.status_code == 200:
-                data = response.json()
-                available_models_list = []
-
-                # Extract model names using the correct format
-                if "models" in data:
-                    available_models_list = [m.get("name", str(m))
-                                             for m in data["models"] if isinstance(m, dict)]
-                elif isinstance(data, list):
-                    available_models_list = [m.get("name", str(m))
-                                             for m in data if isinstance(m, dict)]
-
-                # Display the models
-                if available_models_list:
-                    for model in available_models_list:
-                        st.sidebar.markdown(f"- {model}")
-                else:
-                    st.sidebar.warning("No models available in Ollama")
-                    st.sidebar.markdown("Run this command to add a model:")
-                    st.sidebar.code("ollama pull <model-name>", language="bash")
-            else:
-                st.sidebar.warning("Could not fetch available models")
-
-        except Exception as e:
+        # Served from the model registry so reruns don't wait on Ollama
+        registry = get_model_registry()
+        available_models = registry.get_models()
+
+        if available_models:
+            for model in available_models.values():
+                st.sidebar.markdown(f"- {model['name']}")
+                details = [
+                    f"{model['size'] / 1e9:.1f} GB" if model.get("size") else None,
+                    model.get("parameter_size"),
+                    model.get("quantization"),
+                    model["digest"][:12] if model.get("digest") else None,
+                ]
+                st.sidebar.caption(" · ".join(d for d in details if d))
+        elif registry.error:
             st.sidebar.warning("Could not connect to Ollama server")
+        else:
+            st.sidebar.warning("No models available in Ollama")
+            st.sidebar.markdown("Run this command to add a model:")
+            st.sidebar.code("ollama pull <model-name>", language="bash")
+
+        if st.sidebar.button("Refresh Models", key="refresh_models"):
+            registry.refresh()
+            st.rerun()
 
         st.sidebar.markdown("---")
 
@@ -329,10 +491,106 @@ def render_model_selection():
             set_selected_model(selected_model)
             st.sidebar.success(f"Model changed to {selected_model}")
 
+        # Show partial output while a job runs instead of waiting for the full response
+        st.session_state.stream_output = st.sidebar.checkbox(
+            "Stream output",
+            value=st.session_state.stream_output,
+            key="stream_output_toggle"
+        )
+
+        # Trade completeness for speed by sending only the most central sentences
+        st.session_state.prefilter_input = st.sidebar.checkbox(
+            "Shorten long documents",
+            value=st.session_state.prefilter_input,
+            key="prefilter_toggle",
+            help=f"Remove repeated page headers and footers, then keep the most important "
+                 f"sentences and every clause heading, up to about {PREFILTER_TOKEN_BUDGET} tokens"
+        )
+
+        # Translate finished paragraphs of the summary while the rest is generated
+        pipeline_options = ["Off", *TRANSLATION_LANGUAGES]
+        st.session_state.pipeline_language = st.sidebar.selectbox(
+            "Translate while simplifying",
+            pipeline_options,
+            index=pipeline_options.index(st.session_state.pipeline_language),
+            key="pipeline_language_select"
+        )
+
+        # Show model load times measured at startup
+        st.sidebar.markdown("### Model Warm-up")
+        for model, status in get_model_warmup().get_status().items():
+            if status.get("state") == "loading":
+                st.sidebar.caption(f"{model}: loading...")
+            elif status.get("state") == "failed":
+                st.sidebar.caption(f"{model}: failed to load ({status['error']})")
+            elif status.get("cold_start") is not None:
+                st.sidebar.caption(f"{model}: ready, cold start {status['cold_start']:.1f}s")
+
+        # Show where requests are routed and how busy each host is
+        st.sidebar.markdown("### Ollama Hosts")
+        for host, status in get_host_pool().get_status().items():
+            latency = f"{status['latency'] * 1000:.0f} ms" if status["latency"] is not None else "n/a"
+            if status["healthy"]:
+                st.sidebar.caption(
+                    f"✓ {host}: {status['outstanding']} in flight, {status['requests']} served, "
+                    f"latency {latency}, loaded: {', '.join(status['loaded']) or 'none'}"
+                )
+            else:
+                st.sidebar.caption(f"✗ {host}: unavailable ({status['error']})")
+
+        # Show how often simplifications are served from the result cache
+        st.sidebar.markdown("### Result Cache")
+        cache = get_result_cache()
+        cache_stats = cache.stats()
+        st.sidebar.caption(
+            f"{cache_stats['entries']} entries ({cache_stats['bytes'] / (1024 * 1024):.1f} MB), "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+            f"{inflight.shared} duplicate requests shared"
+        )
+        if st.sidebar.button("Clear Cache", key="clear_cache"):
+            cache.clear()
+            st.sidebar.success("Result cache cleared")
+
+        # Show how often uploads are served without parsing them again
+        st.sidebar.markdown("### Extraction Cache")
+        extraction_stats = get_extraction_cache().stats()
+        st.sidebar.caption(
+            f"{extraction_stats['entries']} files ({extraction_stats['bytes'] / (1024 * 1024):.1f} MB), "
+            f"{extraction_stats['hits']} hits / {extraction_stats['misses']} misses"
+        )
+
+        # Show how often clauses reuse the simplification of a near-duplicate
+        st.sidebar.markdown("### Clause Reuse")
+        clause_index = get_clause_index()
+        index_stats = clause_index.stats()
+        hit_rate = index_stats["hits"] / index_stats["lookups"] if index_stats["lookups"] else 0
+        st.sidebar.caption(
+            f"{index_stats['clauses']} clauses indexed, {hit_rate:.0%} of "
+            f"{index_stats['lookups']:.0f} lookups reused, about {index_stats['seconds_saved']:.0f}s saved"
+        )
+        if st.sidebar.button("Clear Clause Index", key="clear_clause_index"):
+            clause_index.clear()
+            st.sidebar.success("Clause index cleared")
+
+        # Show how often translations come from the translation memory
+        st.sidebar.markdown("### Translation Memory")
+        memory = get_translation_memory()
+        memory_stats = memory.stats()
+        st.sidebar.caption(
+            f"{memory_stats['segments']} segments, {memory_stats['exact']} exact and "
+            f"{memory_stats['fuzzy']} fuzzy matches, {memory_stats['misses']} translated"
+        )
+        if st.sidebar.button("Clear Translation Memory", key="clear_translation_memory"):
+            memory.clear()
+            st.sidebar.success("Translation memory cleared")
+
         # Check if the selected model is available
         st.sidebar.markdown("### Model Status")
         if check_model_availability():
             st.sidebar.success(f"Model '{selected_model}' is available ✓")
+            context_length = get_model_registry().get_context_length(get_selected_model())
+            if context_length:
+                st.sidebar.caption(f"Context window: {context_length} tokens")
         else:
             st.sidebar.error(f"Model '{selected_model}' is not available ✗")
 
@@ -345,16 +603,15 @@ def render_ollama_help():
     st.subheader("Ollama Status")
 
     try:
-        import ollama
         import requests
         import json
-        from utils.ollama_config import OLLAMA_API_HOST
+        from utils.ollama_config import get_ollama_client, ollama_get
+
+        host = get_host_pool().pick()
 
         # Try direct HTTP request first (more reliable)
         try:
-            # Remove http:// if present for requests
-            api_host = OLLAMA_API_HOST.replace("http://", "")
-            response = requests.get(f"http://{api_host}/api/tags")
+            response = ollama_get("/api/tags", host)
 
             if response.status_code == 200:
                 st.success("✅ Connected to Ollama server successfully")
@@ -389,7 +646,7 @@ def render_ollama_help():
 
             # Fall back to using the Python client
             try:
-                client = ollama.Client(host=OLLAMA_API_HOST)
+                client = get_ollama_client(host)
                 models_info = client.list()
 
                 # Display raw response
@@ -0,0 +1,251 @@
+"""
+Batch simplification of a directory of legal documents without the Streamlit UI.
+
+Usage:
+    python batch_simplify.py contracts/ --output-dir results/ --workers 4 --translate hi mr
+
+Results are appended to results.jsonl as each document finishes and every
+outcome is recorded in manifest.jsonl, so an interrupted run picks up where
+it stopped when started again with the same output directory.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import streamlit.logger
+
+from utils.chunking import estimate_tokens, split_into_segments
+from utils.file_extractor import SUPPORTED_EXTENSIONS, extract_document, iter_pdf_pages
+from utils.ollama_config import DEFAULT_MODEL
+from utils.Simplification import simplify_document_async
+from utils.translation import translate_to_languages
+
+
+def find_documents(input_dir):
+    """Return the supported files below a directory, sorted for a stable order"""
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def load_manifest(manifest_path):
+    """Return the content hashes of documents already processed successfully"""
+    done = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as manifest:
+            for line in manifest:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave the last line half written
+                    continue
+                if record.get("status") == "done":
+                    done[record["path"]] = record["sha256"]
+                else:
+                    done.pop(record["path"], None)
+    return done
+
+
+class BatchWriter:
+    """Appends results and manifest records from worker threads"""
+
+    def __init__(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        self.results_path = os.path.join(output_dir, "results.jsonl")
+        self.manifest_path = os.path.join(output_dir, "manifest.jsonl")
+        self.lock = threading.Lock()
+
+    def write(self, result, manifest_record):
+        """Write a result before its manifest record so a finished document is never lost."""
+        with self.lock:
+            if result is not None:
+                with open(self.results_path, "a", encoding="utf-8") as results:
+                    results.write(json.dumps(result, ensure_ascii=False) + "\n")
+            with open(self.manifest_path, "a", encoding="utf-8") as manifest:
+                manifest.write(json.dumps(manifest_record) + "\n")
+
+
+def _keep(pages, kept):
+    """Yield pages while keeping each one, so the full text is known once they are consumed"""
+    for page in pages:
+        kept.append(page)
+        yield page
+
+
+def read_document(path, file_bytes):
+    """
+    Extract the text of a document and its segments.
+
+    Pages of a PDF are segmented as they are extracted, so the first pages
+    are split into clauses while the extraction pool is still parsing the
+    last ones. Other formats keep the paragraphs and headings found by their
+    extractor. Either way the text is not split again when it is chunked.
+
+    Returns:
+        tuple: (text, segments), both None if extraction failed
+    """
+    if path.lower().endswith(".pdf"):
+        pages = []
+        segments = split_into_segments(_keep(iter_pdf_pages(file_bytes), pages))
+        text = "\n\n".join(page.strip() for page in pages if page.strip())
+        return text, segments
+    result = extract_document(file_bytes, os.path.basename(path))
+    if result is None:
+        return None, None
+    return result.text, split_into_segments(result.segments)
+
+
+def process_document(path, file_bytes, sha256, args):
+    """
+    Extract, simplify and optionally translate a single document.
+
+    Returns:
+        dict: The result record
+    """
+    started = time.time()
+    text, segments = read_document(path, file_bytes)
+    if not text or not text.strip():
+        raise ValueError("no text could be extracted")
+
+    clause_stats = {}
+    simplified_text = asyncio.run(simplify_document_async(
+        text, model=args.model, max_parallel=args.chunk_parallel, clause_stats=clause_stats,
+        prefilter=args.prefilter, segments=segments))
+
+    # All target languages are translated at the same time; a failure fails the
+    # document, so it is retried on the next run instead of storing the error
+    translations = asyncio.run(translate_to_languages(simplified_text, args.translate, raise_errors=True)) \
+        if args.translate else {}
+
+    return {
+        "path": path,
+        "sha256": sha256,
+        "model": args.model,
+        "input_text": text,
+        "simplified_text": simplified_text,
+        "translations": translations,
+        "input_tokens": estimate_tokens(text),
+        "output_tokens": estimate_tokens(simplified_text)
+        + sum(estimate_tokens(t) for t in translations.values()),
+        "clauses": clause_stats.get("clauses", 0),
+        "clauses_reused": clause_stats.get("reused", 0),
+        "seconds_saved": round(clause_stats.get("seconds_saved", 0), 3),
+        "seconds": round(time.time() - started, 3),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def write_parquet(results_path, parquet_path):
+    """Convert the JSONL results to Parquet (requires pyarrow)"""
+    try:
+        import pyarrow.json
+        import pyarrow.parquet
+    except ImportError:
+        print("pyarrow is required for Parquet output. Please install it using: pip install pyarrow")
+        return False
+
+    table = pyarrow.json.read_json(results_path)
+    pyarrow.parquet.write_table(table, parquet_path)
+    return True
+
+
+def run_batch(args):
+    """Process every pending document and print throughput at the end"""
+    writer = BatchWriter(args.output_dir)
+    done = load_manifest(writer.manifest_path)
+
+    # Skip documents already processed with unchanged contents
+    pending = []
+    for path in find_documents(args.input_dir):
+        with open(path, "rb") as document:
+            file_bytes = document.read()
+        sha256 = hashlib.sha256(file_bytes).hexdigest()
+        if done.get(path) != sha256:
+            pending.append((path, sha256))
+
+    print(f"{len(pending)} documents to process ({len(done)} already done)")
+
+    started = time.time()
+    completed = failed = input_tokens = output_tokens = 0
+    clauses = clauses_reused = seconds_saved = 0
+
+    def work(path, sha256):
+        with open(path, "rb") as document:
+            return process_document(path, document.read(), sha256, args)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(work, path, sha256): (path, sha256)
+                   for path, sha256 in pending}
+        for future in as_completed(futures):
+            path, sha256 = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                writer.write(None, {"path": path, "sha256": sha256,
+                                    "status": "failed", "error": str(e)})
+                print(f"[failed] {path}: {e}")
+                continue
+
+            completed += 1
+            input_tokens += result["input_tokens"]
+            output_tokens += result["output_tokens"]
+            clauses += result["clauses"]
+            clauses_reused += result["clauses_reused"]
+            seconds_saved += result["seconds_saved"]
+            writer.write(result, {"path": path, "sha256": sha256, "status": "done"})
+            print(f"[{completed + failed}/{len(pending)}] {path} ({result['seconds']}s)")
+
+    elapsed = max(time.time() - started, 1e-9)
+    print(f"Processed {completed} documents, {failed} failed, in {elapsed:.1f}s")
+    print(f"Throughput: {completed / (elapsed / 60):.2f} documents/minute, "
+          f"{input_tokens / elapsed:.1f} input tokens/second, "
+          f"{output_tokens / elapsed:.1f} output tokens/second (estimated)")
+    if clauses:
+        print(f"Clause reuse: {clauses_reused} of {clauses} clauses ({clauses_reused / clauses:.0%}), "
+              f"about {seconds_saved:.0f}s of generation saved")
+
+    if args.format == "parquet" and os.path.exists(writer.results_path):
+        parquet_path = os.path.join(args.output_dir, "results.parquet")
+        if write_parquet(writer.results_path, parquet_path):
+            print(f"Wrote {parquet_path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simplify a directory of legal documents with Ollama.")
+    parser.add_argument("input_dir", help="Directory containing .txt, .docx and .pdf files")
+    parser.add_argument("--output-dir", default="batch_output",
+                        help="Directory for results.jsonl and manifest.jsonl")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Ollama model for simplification")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Documents processed at the same time")
+    parser.add_argument("--chunk-parallel", type=int, default=1,
+                        help="Chunk requests in flight per document")
+    parser.add_argument("--translate", nargs="*", default=[], metavar="LANG",
+                        help="Language codes to translate into, e.g. hi mr")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Shorten documents with the extractive pre-filter before simplifying")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl",
+                        help="Also write results.parquet when set to parquet")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    # Streamlit calls made outside `streamlit run` only log warnings
+    streamlit.logger.set_log_level("error")
+    run_batch(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
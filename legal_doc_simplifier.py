@@ -1,6 +1,8 @@
 import streamlit as st
 from app.session_manager import initialize_session_state
 from app.database_operations import get_database
+from utils.ollama_config import get_selected_model, KEEP_MODELS_RESIDENT, TRANSLATION_MODEL
+from utils.warmup import get_model_warmup
 from app.ui_components import (
     render_delete_dialog,
     render_history_sidebar,
@@ -21,6 +23,12 @@ def main():
     # Initialize session state
     initialize_session_state()
 
+    # Preload models in the background so the first request skips the load time
+    models = [get_selected_model()]
+    if KEEP_MODELS_RESIDENT:
+        models.append(TRANSLATION_MODEL)
+    get_model_warmup().warm_up_in_background(models)
+
     # Set page title
     st.title("Legal Document Simplification System")
     st.markdown("##### Using Ollama for local AI processing")
@@ -0,0 +1,63 @@
+import json
+
+import batch_simplify
+from utils import translation
+
+
+class FakeHostPool:
+    def capacity(self):
+        return 2
+
+
+class FakeWarmup:
+    def invalidate(self):
+        pass
+
+
+async def fake_simplify(text, **kwargs):
+    return "The tenant pays rent monthly."
+
+
+async def recording_simplify(text, segments=None, **kwargs):
+    recording_simplify.calls.append((text, segments))
+    return "Summary."
+
+
+async def failing_translation(*args, **kwargs):
+    raise ConnectionError("translation host unreachable")
+
+
+def test_translation_failure_marks_document_failed(tmp_path, monkeypatch):
+    input_dir = tmp_path / "contracts"
+    input_dir.mkdir()
+    (input_dir / "lease.txt").write_text("The lessee shall pay rent on the first of every month.")
+    output_dir = tmp_path / "results"
+
+    # Keep the shared host pool and warm-up manager, and their background threads, out of the test
+    monkeypatch.setattr(translation, "get_host_pool", FakeHostPool)
+    monkeypatch.setattr(translation, "get_model_warmup", FakeWarmup)
+    monkeypatch.setattr(batch_simplify, "simplify_document_async", fake_simplify)
+    monkeypatch.setattr(translation, "_translate_paragraph", failing_translation)
+    batch_simplify.main([str(input_dir), "--output-dir", str(output_dir), "--translate", "hi"])
+
+    records = [json.loads(line) for line in (output_dir / "manifest.jsonl").read_text().splitlines()]
+    assert [record["status"] for record in records] == ["failed"]
+    assert "unreachable" in records[0]["error"]
+    assert not (output_dir / "results.jsonl").exists()
+    assert batch_simplify.load_manifest(str(output_dir / "manifest.jsonl")) == {}
+
+
+def test_pdf_pages_are_segmented_as_they_are_extracted(tmp_path, monkeypatch):
+    input_dir = tmp_path / "contracts"
+    input_dir.mkdir()
+    (input_dir / "lease.pdf").write_bytes(b"%PDF")
+    pages = ["1. The lessee shall pay rent.\n2. The lessor shall repair.", "3. Notice must be written."]
+
+    monkeypatch.setattr(batch_simplify, "iter_pdf_pages", lambda file_bytes: iter(pages))
+    monkeypatch.setattr(batch_simplify, "simplify_document_async", recording_simplify)
+    recording_simplify.calls = []
+    batch_simplify.main([str(input_dir), "--output-dir", str(tmp_path / "results")])
+
+    [(text, segments)] = recording_simplify.calls
+    assert text == "\n\n".join(pages)
+    assert segments == ["1. The lessee shall pay rent.", "2. The lessor shall repair.", "3. Notice must be written."]
@@ -0,0 +1,37 @@
+from utils.chunking import plan_chunks, split_into_segments
+from utils.extraction_result import ExtractionResult
+
+PAGES = [
+    "LEASE AGREEMENT\n1. The lessee shall pay rent monthly.\n2. The lessor shall repair the roof.",
+    "3. Either party may terminate with notice.\n(a) Notice must be written.",
+    "",
+    "IN WITNESS WHEREOF the parties sign.",
+]
+
+
+def test_pages_are_segmented_like_the_joined_text():
+    pages = iter(PAGES)
+    assert split_into_segments(pages) == split_into_segments("\n\n".join(PAGES))
+    assert next(pages, None) is None
+
+
+def test_plan_uses_given_segments_without_splitting_again():
+    text = "\n\n".join(PAGES)
+    segments = split_into_segments(PAGES)
+    assert plan_chunks(text, 20, segments=segments) == plan_chunks(text, 20)
+    assert plan_chunks("", 20, segments=["Only clause."])[0][1] == ("Only clause.",)
+
+
+def test_extracted_headings_open_the_segment_of_their_paragraph():
+    result = ExtractionResult.from_blocks([
+        ("ARTICLE I", 1, 1),
+        ("1.1 Rent", 1, 2),
+        ("The lessee shall pay rent monthly. 2. This sentence is not a clause.", 1, None),
+        ("The lessor shall repair the roof.", 2, None),
+        ("SCHEDULE A", 2, 1),
+    ])
+    assert split_into_segments(result.segments) == [
+        "ARTICLE I\n1.1 Rent\nThe lessee shall pay rent monthly. 2. This sentence is not a clause.",
+        "The lessor shall repair the roof.",
+        "SCHEDULE A",
+    ]
@@ -0,0 +1,21 @@
+from utils.clause_index import ClauseIndex, key_terms
+
+ASSIGNMENT = ("The Lessee shall, with the prior written consent of the Lessor, assign or transfer "
+              "its rights and obligations under this Agreement to any affiliate of the Lessee.")
+NO_ASSIGNMENT = ("The Lessee shall not, with the prior written consent of the Lessor, assign or transfer "
+                 "its rights and obligations under this Agreement to any affiliate of the Lessee.")
+
+
+def test_key_terms_include_negations_and_modals():
+    assert key_terms("The tenant shall pay") != key_terms("The tenant shall not pay")
+    assert key_terms("The tenant may sublet") != key_terms("The tenant must sublet")
+    assert key_terms("The tenant can't sublet") == key_terms("The tenant cannot sublet")
+
+
+def test_negated_clause_does_not_reuse_permissive_explanation(tmp_path):
+    index = ClauseIndex(str(tmp_path / "history.db"))
+    index.add(ASSIGNMENT, "[1] The tenant may transfer the lease with consent.", "model", 2.0)
+
+    assert index.find(ASSIGNMENT, "model") is not None
+    assert index.find(NO_ASSIGNMENT, "model") is None
+    index.close()
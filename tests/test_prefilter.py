@@ -0,0 +1,26 @@
+from utils.chunking import estimate_tokens
+from utils.prefilter import prefilter_text
+
+WORDS = "tenant landlord rent premises notice term payment deposit repair insurance breach remedy".split()
+
+
+def _contract(clauses):
+    return "\n\n".join(
+        f"{number}. CLAUSE {number} ON {WORDS[number % len(WORDS)].upper()}\n"
+        + " ".join(f"The {WORDS[(number + k) % len(WORDS)]} clause {number} sentence {k} applies "
+                   f"to the {WORDS[(number * k) % len(WORDS)]}." for k in range(4))
+        for number in range(1, clauses + 1)
+    )
+
+
+def test_filtered_text_stays_within_budget():
+    text = _contract(199)
+    for max_tokens in (1000, 300, 50):
+        filtered = prefilter_text(text, max_tokens)
+        assert 0 < estimate_tokens(filtered) <= max_tokens
+
+
+def test_headings_do_not_crowd_out_every_sentence():
+    filtered = prefilter_text(_contract(199), 300)
+    assert "sentence" in filtered
+    assert filtered.startswith("1. CLAUSE 1")
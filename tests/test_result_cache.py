@@ -0,0 +1,22 @@
+from utils.result_cache import ResultCache
+
+
+def test_lookups_buffer_counters_without_write_transactions(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cache.db")
+    cache = ResultCache(db_path)
+    cache.set("key", "value")
+
+    def no_write():
+        raise AssertionError("lookup took the write lock")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(cache.pool, "write", no_write)
+        assert cache.get("key") == "value"
+        assert cache.get("missing") is None
+        stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    cache.close()
+    reopened = ResultCache(db_path)
+    assert (reopened.stats()["hits"], reopened.stats()["misses"]) == (1, 1)
+    reopened.close()
@@ -0,0 +1,71 @@
+import asyncio
+from contextlib import contextmanager
+
+from utils import Simplification
+from utils.ollama_config import REDUCE_TEMPLATE
+from utils.result_cache import ResultCache
+
+
+class FakeCache:
+    make_key = staticmethod(ResultCache.make_key)
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class FakeHostPool:
+    @contextmanager
+    def acquire(self, model):
+        yield "host"
+
+
+class FakeClients:
+    """Replies are cut off until num_predict reaches enough_tokens"""
+
+    def __init__(self, enough_tokens):
+        self.enough_tokens = enough_tokens
+        self.requests = []
+
+    def get(self, host):
+        return self
+
+    async def chat(self, model, messages, options, keep_alive):
+        self.requests.append(options)
+        done_reason = "stop" if options["num_predict"] >= self.enough_tokens else "length"
+        return {"message": {"content": "Plain summary."}, "done_reason": done_reason}
+
+
+def _run_chat(monkeypatch, clients, content, max_tokens, final):
+    cache = FakeCache()
+    monkeypatch.setattr(Simplification, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(Simplification, "get_host_pool", FakeHostPool)
+    monkeypatch.setattr(Simplification, "get_keep_alive", lambda model: "5m")
+    monkeypatch.setattr(Simplification, "_context_window", lambda model: 32768)
+    text = asyncio.run(Simplification._chat(
+        clients, asyncio.Semaphore(1), "model", REDUCE_TEMPLATE, content, max_tokens, final=final))
+    return text, cache
+
+
+def test_truncated_reply_is_retried_with_more_room(monkeypatch):
+    clients = FakeClients(enough_tokens=3000)
+    text, cache = _run_chat(monkeypatch, clients, "word " * 1500 + "retry", 4096, final=False)
+
+    assert [options["num_predict"] for options in clients.requests][-1] >= 3000
+    assert len(clients.requests) == 2
+    assert text == "Plain summary."
+    assert list(cache.values.values()) == ["Plain summary."]
+
+
+def test_final_reply_cut_off_is_flagged_and_not_cached(monkeypatch):
+    clients = FakeClients(enough_tokens=10 ** 6)
+    text, cache = _run_chat(monkeypatch, clients, "word " * 1500 + "final", 4096, final=True)
+
+    assert clients.requests[0]["num_predict"] == 4096
+    assert text.endswith(Simplification.TRUNCATION_NOTICE)
+    assert not cache.values
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_errors_of_the_call_are_shared():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait()
+        raise ValueError("model not found")
+
+    def follower():
+        try:
+            flight.do("key", lambda: "unused")
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=lambda: pytest.raises(ValueError, flight.do, "key", failing))
+    leader.start()
+    started.wait()
+    thread = threading.Thread(target=follower)
+    thread.start()
+    while not flight.shared:
+        pass
+    release.set()
+    leader.join()
+    thread.join()
+    assert [str(e) for e in errors] == ["model not found"]
+
+
+def test_follower_retries_when_leader_is_cancelled():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "translated"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do_async("key", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do_async("key", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "translated"
+    assert not flight.calls
+
+
+def test_cancelled_follower_does_not_cancel_the_call():
+    flight = SingleFlight()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.do_async("key", call))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do_async("key", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        followers[0].cancel()
+        release.set()
+        return await leader, await followers[1]
+
+    assert asyncio.run(scenario()) == ("done", "done")
+
+
+def test_sync_follower_retries_when_leader_exits():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def interrupted():
+        started.set()
+        release.wait()
+        raise GeneratorExit
+
+    leader = threading.Thread(target=lambda: pytest.raises(GeneratorExit, flight.do, "key", interrupted))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=lambda: results.append(flight.do("key", lambda: "extracted")))
+    follower.start()
+    while not flight.shared:
+        pass
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == ["extracted"]
@@ -0,0 +1,52 @@
+from utils.ollama_config import CHUNK_SUMMARY_TOKENS, CHUNK_TEMPLATE, REDUCE_TEMPLATE, SYSTEM_TEMPLATE
+from utils.token_budget import (
+    MIN_PREDICT_TOKENS,
+    chunk_token_budget,
+    generation_options,
+    model_context_size,
+    prompt_tokens,
+)
+
+
+def test_map_and_reduce_requests_share_num_ctx():
+    window = 8192
+    chunk = "word " * int(chunk_token_budget(window) * 0.8)
+    map_options = generation_options(CHUNK_TEMPLATE, chunk, CHUNK_SUMMARY_TOKENS, window)
+    reduce_options = generation_options(REDUCE_TEMPLATE, "word " * 200, 4000, window)
+    short_options = generation_options(SYSTEM_TEMPLATE, "word " * 50, 4000, window)
+
+    assert map_options["num_ctx"] == reduce_options["num_ctx"] == short_options["num_ctx"] \
+        == model_context_size(window)
+    assert map_options["num_predict"] == CHUNK_SUMMARY_TOKENS
+
+
+def test_num_predict_fits_num_ctx_and_max_tokens():
+    for window in (2048, 8192, 32768):
+        for words in (10, 500, 1500):
+            for max_tokens in (256, 1024, 4096):
+                for grow in (False, True):
+                    content = "word " * words
+                    needed = prompt_tokens(REDUCE_TEMPLATE, content)
+                    if window - needed < MIN_PREDICT_TOKENS:
+                        continue
+                    options = generation_options(REDUCE_TEMPLATE, content, max_tokens, window, grow=grow)
+                    assert needed + options["num_predict"] <= options["num_ctx"] <= window
+                    assert MIN_PREDICT_TOKENS <= options["num_predict"] or options["num_predict"] == max_tokens
+                    assert options["num_predict"] <= max_tokens
+
+
+def test_final_request_grows_to_fit_max_tokens():
+    content = "word " * 1500
+    shared = generation_options(REDUCE_TEMPLATE, content, 4096, 32768)
+    final = generation_options(REDUCE_TEMPLATE, content, 4096, 32768, grow=True)
+
+    assert shared["num_ctx"] == model_context_size(32768)
+    assert shared["num_predict"] < 4096
+    assert final["num_predict"] == 4096
+    assert final["num_ctx"] >= prompt_tokens(REDUCE_TEMPLATE, content) + 4096
+
+
+def test_num_ctx_grows_only_for_long_prompts():
+    options = generation_options(SYSTEM_TEMPLATE, "word " * 6000, 4000, 32768)
+    assert options["num_ctx"] > model_context_size(32768)
+    assert options["num_ctx"] - options["num_predict"] > 6000
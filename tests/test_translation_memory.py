@@ -0,0 +1,15 @@
+from utils.translation_memory import TranslationMemory
+
+ALLOWED = "You are allowed to sublet the premises to a family member for a period of up to twelve months."
+NOT_ALLOWED = "You are not allowed to sublet the premises to a family member for a period of up to twelve months."
+REWORDED = "You are allowed to sublet these premises to a family member for a period of up to twelve months."
+
+
+def test_fuzzy_match_ignores_negated_segment(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "translation_memory.db"))
+    memory.add(ALLOWED, "translated", "hi", "model")
+
+    assert memory.lookup(REWORDED, "hi", "model")[0] == "translated"
+    assert memory.lookup(NOT_ALLOWED, "hi", "model") is None
+    assert memory.lookup(NOT_ALLOWED.replace("are not", "aren't"), "hi", "model") is None
+    memory.close()
@@ -1,55 +1,418 @@
-import ollama
+import re
+import time
+import asyncio
 import streamlit as st
-from utils.ollama_config import get_selected_model, OLLAMA_API_HOST, SYSTEM_TEMPLATE
+from utils.result_cache import get_result_cache
+from utils.model_registry import get_model_registry
+from utils.single_flight import LeaderAbandoned, inflight
+from utils.host_pool import AsyncClients, get_host_pool
+from utils.clause_index import get_clause_index
+from utils.prefilter import prefilter_text
+from utils.chunking import pack_segments, plan_chunks
+from utils.token_budget import DEFAULT_CONTEXT_WINDOW, chunk_token_budget, generation_options
+from utils.ollama_config import (
+    get_selected_model,
+    get_ollama_client,
+    get_keep_alive,
+    SYSTEM_TEMPLATE,
+    CHUNK_TEMPLATE,
+    REDUCE_TEMPLATE,
+    CHUNK_SUMMARY_TOKENS,
+    CHUNK_MAX_RETRIES,
+    CHUNK_RETRY_BACKOFF,
+    PREFILTER_TOKEN_BUDGET,
+)
 
 
-@st.cache_data(show_spinner=True)
-def simplify_document(user_input, max_tokens=4096):
+# Clause number at the start of a line in a chunk simplification, e.g. "[3]" or "**[3]**:"
+CLAUSE_MARKER = re.compile(r"^[ \t*#>_-]*\[(\d+)\][ \t*:.)_-]*", re.MULTILINE)
+
+# Appended to a simplification that stopped at its output limit, since Ollama cuts it off silently
+TRUNCATION_NOTICE = "\n\n*[The simplification was cut short because it reached the model's output limit.]*"
+
+
+def _strip_reasoning(text):
+    """Remove <think> blocks emitted by reasoning models such as deepseek-r1"""
+    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+
+
+def _number_clauses(pieces):
+    """Join the clauses of a chunk, numbering them as CHUNK_TEMPLATE expects"""
+    return "\n\n".join(f"[{number}] {piece}" for number, piece in enumerate(pieces, 1))
+
+
+def _split_clauses(summary, count):
+    """
+    Split a chunk simplification into the explanation of each clause.
+
+    Returns:
+        list: One explanation per clause, or None if the model did not number
+            every clause in order
+    """
+    parts = CLAUSE_MARKER.split(summary)
+    numbers = [int(number) for number in parts[1::2]]
+    explanations = [part.strip() for part in parts[2::2]]
+    if numbers != list(range(1, count + 1)) or not all(explanations):
+        return None
+    return explanations
+
+
+def _messages(system_prompt, content):
+    """Build the system/user message pair for a request"""
+    return [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": content
+        }
+    ]
+
+
+def _context_window(model):
+    """Get the model's context window, falling back to a default"""
+    return get_model_registry().get_context_length(model) or DEFAULT_CONTEXT_WINDOW
+
+
+def _semaphore(max_parallel=None):
+    """Limit requests in flight to the slots of every healthy host"""
+    return asyncio.Semaphore(max_parallel or get_host_pool().capacity())
+
+
+def _options(model, system_prompt, content, max_tokens, grow=False):
+    """Build generation options sized to the request's input length"""
+    return generation_options(system_prompt, content, max_tokens, _context_window(model), grow=grow)
+
+
+def _truncated(response):
+    """Whether Ollama stopped a response because it reached num_predict"""
+    return response.get("done_reason") == "length"
+
+
+async def _chat(clients, semaphore, model, system_prompt, content, max_tokens, timing=None, final=False):
     """
-    Simplifies a legal document using Ollama.
+    Send a single system/user exchange to Ollama and return the reply text.
+
+    Responses are served from the persistent result cache when possible, and
+    identical requests already in flight in any session are joined instead of
+    repeated. Otherwise the request waits for a slot on the semaphore, goes to
+    the least busy host from the host pool and is retried with exponential
+    backoff, so one failing chunk or host does not fail the whole document.
+    When a timing dict is given, the seconds spent generating are stored in it.
+
+    The final request of a document may use a larger num_ctx so its output
+    can use max_tokens. Other replies cut off at num_predict are requested
+    again with all the room the window allows. A reply still cut off is not
+    cached, and a final one ends with TRUNCATION_NOTICE.
+    """
+    cache = get_result_cache()
+    options = _options(model, system_prompt, content, max_tokens, grow=final)
+    key = cache.make_key(content, model, system_prompt, options)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def generate(options):
+        for attempt in range(CHUNK_MAX_RETRIES + 1):
+            try:
+                async with semaphore:
+                    started = time.monotonic()
+                    with get_host_pool().acquire(model) as host:
+                        response = await clients.get(host).chat(
+                            model=model,
+                            messages=_messages(system_prompt, content),
+                            options=options,
+                            keep_alive=get_keep_alive(model)
+                        )
+                    if timing is not None:
+                        timing["seconds"] = time.monotonic() - started
+                return response
+            except Exception:
+                if attempt == CHUNK_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(CHUNK_RETRY_BACKOFF * 2 ** attempt)
+
+    async def request():
+        response = await generate(options)
+        if _truncated(response) and not final:
+            grown = _options(model, system_prompt, content, max_tokens, grow=True)
+            if grown["num_predict"] > options["num_predict"]:
+                response = await generate(grown)
+
+        text = response["message"]["content"]
+        if _truncated(response):
+            return text + TRUNCATION_NOTICE if final else text
+        cache.set(key, text)
+        return text
+
+    return await inflight.do_async(key, request)
+
+
+async def _condense_summaries(clients, semaphore, model, summaries, budget):
+    """
+    Reduce summaries in groups until they fit in a single chunk budget.
+
+    Returns:
+        str: The summaries joined into one block that fits the budget
+    """
+    groups = pack_segments(summaries, budget)
+    while len(groups) > 1:
+        if len(groups) == len(summaries):
+            # Every summary fills a budget on its own; merge pairwise so each level shrinks
+            groups = ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+
+        partials = await asyncio.gather(*[
+            _chat(clients, semaphore, model, REDUCE_TEMPLATE, group, CHUNK_SUMMARY_TOKENS)
+            for group in groups
+        ])
+        summaries = [_strip_reasoning(partial) for partial in partials]
+        groups = pack_segments(summaries, budget)
+    return groups[0]
+
+
+async def reduce_summaries(clients, semaphore, model, summaries, max_tokens):
+    """
+    Combine per-chunk simplifications into a single summary.
+
+    Summaries that do not fit in one chunk budget are reduced in groups first,
+    so the context of every request stays bounded by the chunk size.
+
+    Args:
+        clients (AsyncClients): Ollama AsyncClients per host for the current event loop
+        semaphore (asyncio.Semaphore): Limits the number of requests in flight
+        model (str): Model name
+        summaries (list): Simplified chunks in document order
+        max_tokens (int): Maximum number of tokens for the final summary
+
+    Returns:
+        str: The combined summary
+    """
+    budget = chunk_token_budget(_context_window(model))
+    combined = await _condense_summaries(clients, semaphore, model, summaries, budget)
+    return await _chat(clients, semaphore, model, REDUCE_TEMPLATE, combined, max_tokens, final=True)
+
+
+async def _map_document(clients, semaphore, model, user_input, previous_chunks=None, chunk_records=None,
+                        clause_stats=None, prefilter=False, segments=None):
+    """
+    Run the map phase and return the final request to send.
+
+    Short documents need no map phase and are sent as they are. Long
+    documents are split into chunks that are simplified concurrently and
+    condensed until they fit in one reduce request. Chunks unchanged since
+    previous_chunks reuse their stored simplification, and clauses that are
+    near-duplicates of a clause in the clause index reuse its simplification.
+    With prefilter, the document is first shrunk to PREFILTER_TOKEN_BUDGET.
+    Segments already split from the document are chunked as they are.
+
+    Returns:
+        tuple: (system_prompt, content) for the final request
+    """
+    if prefilter:
+        user_input = prefilter_text(user_input, PREFILTER_TOKEN_BUDGET)
+        # The filtered text no longer matches the segments
+        segments = None
+
+    # Chunks shrink below CHUNK_TOKEN_BUDGET for models with small context windows
+    budget = chunk_token_budget(_context_window(model))
+    plan = plan_chunks(user_input, budget, previous_chunks, segments=segments)
+
+    # Short documents are simplified in a single request
+    if len(plan) <= 1:
+        return SYSTEM_TEMPLATE, user_input
+
+    # Look up every clause of the chunks to simplify in the clause index
+    index = get_clause_index()
+    reused = {
+        piece: index.find(piece, model)
+        for _, pieces, simplified_text in plan if simplified_text is None
+        for piece in pieces
+    }
+
+    if clause_stats is not None:
+        matches = [match for match in reused.values() if match]
+        clause_stats.update(
+            clauses=len(reused),
+            reused=len(matches),
+            seconds_saved=sum(seconds for _, seconds in matches)
+        )
+
+    async def simplify_chunk(pieces, simplified_text):
+        if simplified_text is not None:
+            return simplified_text
+
+        # Only clauses without a near-duplicate go to the model
+        novel = [piece for piece in pieces if not reused[piece]]
+        explanations = []
+        if novel:
+            timing = {}
+            summary = _strip_reasoning(await _chat(
+                clients, semaphore, model, CHUNK_TEMPLATE, _number_clauses(novel), CHUNK_SUMMARY_TOKENS, timing))
+
+            explanations = _split_clauses(summary, len(novel))
+            if explanations is None:
+                # Without numbering the summary cannot be split; keep it in place of the first clause
+                explanations = [CLAUSE_MARKER.sub("", summary)] + [""] * (len(novel) - 1)
+            else:
+                # Index each clause with its share of the generation time
+                total_length = sum(len(piece) for piece in novel)
+                for piece, explanation in zip(novel, explanations):
+                    index.add(piece, explanation, model, timing.get("seconds", 0) * len(piece) / total_length)
+
+        # Put reused and new explanations back in document order
+        new_explanations = iter(explanations)
+        ordered = [reused[piece][0] if reused[piece] else next(new_explanations) for piece in pieces]
+        return "\n\n".join(text for text in ordered if text)
+
+    # Map: simplify each changed chunk on its own
+    summaries = await asyncio.gather(*[
+        simplify_chunk(pieces, simplified_text)
+        for _, pieces, simplified_text in plan
+    ])
+
+    if chunk_records is not None:
+        chunk_records.extend(
+            (list(segment_hashes), summary)
+            for (segment_hashes, _, _), summary in zip(plan, summaries)
+        )
+
+    # Reduce: stitch the simplified chunks into one request
+    return REDUCE_TEMPLATE, await _condense_summaries(clients, semaphore, model, summaries, budget)
+
+
+async def _prepare_final_request(user_input, model, max_parallel=None, previous_chunks=None, chunk_records=None,
+                                 clause_stats=None, prefilter=False, segments=None):
+    """Run the map phase with fresh AsyncClients bound to the current event loop"""
+    async with AsyncClients() as clients:
+        return await _map_document(
+            clients, _semaphore(max_parallel), model, user_input, previous_chunks, chunk_records,
+            clause_stats, prefilter, segments)
+
+
+async def simplify_document_async(user_input, max_tokens=4096, model=None, max_parallel=None,
+                                  previous_chunks=None, chunk_records=None, clause_stats=None,
+                                  prefilter=False, segments=None):
+    """
+    Simplifies a legal document using Ollama, dispatching chunks concurrently.
+
+    Long documents are split into clause-aligned chunks that are simplified
+    in parallel and then combined by a final reduce pass. Results keep the
+    order of the document regardless of completion order.
 
     Args:
         user_input (str): The legal text to simplify
         max_tokens (int): Maximum number of tokens for the response
+        model (str): Model name, defaults to the selected model
+        max_parallel (int): Maximum requests in flight, defaults to the
+            MAX_PARALLEL_REQUESTS slots of every healthy host
+        previous_chunks (list): Chunk records of an earlier version of the
+            document; unchanged chunks reuse their simplification
+        chunk_records (list): Filled with the chunk records of this document
+        clause_stats (dict): Filled with the number of clauses looked up in
+            the clause index, how many were reused and the seconds saved
+        prefilter (bool): Strip page furniture and keep only the most central
+            sentences, up to PREFILTER_TOKEN_BUDGET, before simplifying
+        segments (list): Segment strings of user_input when they are already
+            known, e.g. split from PDF pages as they were extracted
 
     Returns:
         str: The simplified text
     """
-    try:
-        # Get the selected model
-        model = get_selected_model()
+    model = model or get_selected_model()
+    semaphore = _semaphore(max_parallel)
 
-        # Set up the host
-        client = ollama.Client(host=OLLAMA_API_HOST)
-
-        # Generate simplified text using Ollama
-        response = client.chat(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": SYSTEM_TEMPLATE
-                },
-                {
-                    "role": "user",
-                    "content": user_input
-                }
-            ],
-            options={
-                "num_predict": max_tokens,
-                "temperature": 0.1  # Low temperature for more deterministic output
-            }
-        )
+    # Clients are created per host as the pool routes requests to them
+    async with AsyncClients() as clients:
+        system_prompt, content = await _map_document(
+            clients, semaphore, model, user_input, previous_chunks, chunk_records, clause_stats, prefilter,
+            segments)
+        return await _chat(clients, semaphore, model, system_prompt, content, max_tokens, final=True)
 
-        # Extract the simplified text from the response
-        simplified_text = response["message"]["content"]
 
-        return simplified_text
+def iter_simplification(user_input, max_tokens=4096, model=None, previous_chunks=None, chunk_records=None,
+                        clause_stats=None, prefilter=False, segments=None):
+    """
+    Simplifies a legal document using Ollama, yielding the output as it is generated.
+
+    The map phase of long documents runs first; the final request is then
+    streamed token by token, so callers can render output before it completes.
+    It may use a larger num_ctx so the output can use max_tokens; if it is
+    still cut off, TRUNCATION_NOTICE is yielded last and the result is not
+    cached. Errors are raised to the caller.
+
+    Args:
+        user_input (str): The legal text to simplify
+        max_tokens (int): Maximum number of tokens for the response
+        model (str): Model name, defaults to the selected model
+        previous_chunks (list): Chunk records of an earlier version of the
+            document; unchanged chunks reuse their simplification
+        chunk_records (list): Filled with the chunk records of this document
+        clause_stats (dict): Filled with the number of clauses looked up in
+            the clause index, how many were reused and the seconds saved
+        prefilter (bool): Strip page furniture and keep only the most central
+            sentences, up to PREFILTER_TOKEN_BUDGET, before simplifying
+        segments (list): Segment strings of user_input when they are already
+            known, so it is not split again
 
+    Yields:
+        str: Pieces of the simplified text
+    """
+    model = model or get_selected_model()
+    system_prompt, content = asyncio.run(_prepare_final_request(
+        user_input, model, previous_chunks=previous_chunks, chunk_records=chunk_records,
+        clause_stats=clause_stats, prefilter=prefilter, segments=segments))
+
+    cache = get_result_cache()
+    options = _options(model, system_prompt, content, max_tokens, grow=True)
+    key = cache.make_key(content, model, system_prompt, options)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    # Another session is generating the same text: wait for it instead, taking
+    # over if it stops early
+    while True:
+        future, leader = inflight.join(key)
+        if leader:
+            break
+        try:
+            result = future.result()
+        except LeaderAbandoned:
+            continue
+        yield result
+        return
+
+    try:
+        parts = []
+        truncated = False
+        with get_host_pool().acquire(model) as host:
+            for part in get_ollama_client(host).chat(
+                model=model,
+                messages=_messages(system_prompt, content),
+                options=options,
+                keep_alive=get_keep_alive(model),
+                stream=True
+            ):
+                parts.append(part["message"]["content"])
+                yield part["message"]["content"]
+                truncated = _truncated(part)
+
+        if truncated:
+            parts.append(TRUNCATION_NOTICE)
+            yield TRUNCATION_NOTICE
+        else:
+            cache.set(key, "".join(parts))
     except Exception as e:
-        st.error(f"Error during simplification: {str(e)}")
-        # Return fallback message in case of error
-        return "Sorry, there was an error simplifying the document. Please try again."
+        inflight.finish(key, error=e)
+        raise
+    except BaseException:
+        # Closed early, e.g. the session went away: waiting callers generate it themselves
+        inflight.abandon(key)
+        raise
+    inflight.finish(key, "".join(parts))
 
 
 def check_model_availability():
@@ -61,68 +424,32 @@ def check_model_availability():
         bool: True if model is available, False otherwise
     """
     try:
-        import requests
         model = get_selected_model()
 
-        # Get API host without http:// if present
-        api_host = OLLAMA_API_HOST.replace("http://", "")
+        # Use the cached model list instead of querying Ollama on every rerun
+        registry = get_model_registry()
+        available_model = registry.resolve(model)
 
-        # Direct HTTP request (more reliable)
-        try:
-            response = requests.get(f"http://{api_host}/api/tags")
-
-            if response.status_code == 200:
-                data = response.json()
-
-                # Extract model names using different possible formats
-                available_models = []
-
-                # Format 1: "models" key with objects that have "name"
-                if "models" in data and isinstance(data["models"], list):
-                    for model_info in data["models"]:
-                        if isinstance(model_info, dict) and "name" in model_info:
-                            available_models.append(model_info["name"])
-
-                # Format 2: Direct list of model names
-                elif isinstance(data, list):
-                    for item in data:
-                        if isinstance(item, dict) and "name" in item:
-                            available_models.append(item["name"])
-                        elif isinstance(item, str):
-                            available_models.append(item)
-
-                # Check if model is available
-                if model in available_models:
-                    return True
-                else:
-                    # Check if model without version tag is available
-                    base_model = model.split(":")[0] if ":" in model else model
-                    base_matches = [
-                        m for m in available_models if m.startswith(base_model)]
-
-                    if base_matches:
-                        st.info(
-                            f"Using available model variant: {base_matches[0]}")
-                        # Update the selected model to the available variant
-                        from utils.ollama_config import set_selected_model
-                        set_selected_model(base_matches[0])
-                        return True
-                    else:
-                        st.warning(f"""
-                        The model '{model}' is not available locally. 
-                        To download it, open a terminal and run:
-                        ```
-                        ollama pull {model}
-                        ```
-                        """)
-                        return False
-            else:
-                st.error(
-                    f"Ollama API returned status code: {response.status_code}")
-                return False
-
-        except requests.exceptions.RequestException as req_error:
-            st.error(f"HTTP request to Ollama failed: {str(req_error)}")
+        if available_model == model:
+            return True
+        elif available_model:
+            st.info(
+                f"Using available model variant: {available_model}")
+            # Update the selected model to the available variant
+            from utils.ollama_config import set_selected_model
+            set_selected_model(available_model)
+            return True
+        elif registry.error:
+            st.error(f"Could not fetch models from Ollama: {registry.error}")
+            return False
+        else:
+            st.warning(f"""
+            The model '{model}' is not available locally. 
+            To download it, open a terminal and run:
+            ```
+            ollama pull {model}
+            ```
+            """)
             return False
 
     except Exception as e:
@@ -0,0 +1,237 @@
+import hashlib
+import re
+
+# Rough characters-per-token ratio for English legal prose
+CHARS_PER_TOKEN = 4
+
+# Lines that open a new structural unit in a legal document
+CLAUSE_START_PATTERN = re.compile(
+    r"""^\s*(?:
+        (?:ARTICLE|Article|SECTION|Section|CLAUSE|Clause|SCHEDULE|Schedule|
+           EXHIBIT|Exhibit|ANNEXURE|Annexure|APPENDIX|Appendix)\s+[\dIVXLC]+\b
+        | WHEREAS\b | Whereas\b
+        | NOW,?\s+THEREFORE\b | Now,?\s+therefore\b
+        | IN\s+WITNESS\s+WHEREOF\b
+        | \d+(?:\.\d+)*\.?\s+\S
+        | \(?[a-z]\)\s+\S
+        | \(?(?:i|ii|iii|iv|v|vi|vii|viii|ix|x)\)\s+\S
+        | [A-Z]\.\s+\S
+    )""",
+    re.VERBOSE,
+)
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.;:!?])\s+(?=[A-Z(\"'])")
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Approximate token count
+    """
+    if not text:
+        return 0
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def split_into_segments(text):
+    """
+    Split a legal document into structural segments.
+
+    Paragraphs are separated on blank lines and further split wherever a line
+    opens a numbered clause, section heading or recital. Segments of an
+    ExtractionResult are taken as they are, since the extractor already
+    found their boundaries; each heading opens a segment together with the
+    paragraph that follows it.
+
+    Args:
+        text: The document text, or an iterable of its parts such as the
+            pages yielded by iter_pdf_pages, read as if joined by blank
+            lines, or the segments of an ExtractionResult; each part is
+            segmented as soon as it arrives
+
+    Returns:
+        list: Segment strings in document order
+    """
+    parts = [text] if text is None or isinstance(text, str) else text
+    segments = []
+    headings = []
+    for part in parts:
+        if part is not None and not isinstance(part, str):
+            # An extracted segment: headings wait for the paragraph they introduce
+            headings.append(part.text)
+            if part.heading_level is None:
+                segments.append("\n".join(headings).strip())
+                headings = []
+            continue
+        if headings:
+            segments.append("\n".join(headings).strip())
+            headings = []
+        for paragraph in re.split(r"\n\s*\n", part or ""):
+            current = []
+            for line in paragraph.splitlines():
+                if current and CLAUSE_START_PATTERN.match(line):
+                    segments.append("\n".join(current).strip())
+                    current = []
+                current.append(line)
+            if current:
+                segments.append("\n".join(current).strip())
+    if headings:
+        segments.append("\n".join(headings).strip())
+    return [segment for segment in segments if segment]
+
+
+def _split_oversized(segment, max_tokens):
+    """Break a segment that exceeds the budget on sentences, then on words."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_BOUNDARY.split(segment):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _split_pieces(segments, max_tokens):
+    """Replace segments that exceed the budget with their pieces."""
+    pieces = []
+    for segment in segments:
+        if estimate_tokens(segment) > max_tokens:
+            pieces.extend(_split_oversized(segment, max_tokens))
+        else:
+            pieces.append(segment)
+    return pieces
+
+
+def _pack_groups(pieces, max_tokens):
+    """Greedily group consecutive pieces so each group fits the budget."""
+    groups = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def pack_segments(segments, max_tokens):
+    """
+    Greedily pack consecutive segments into chunks within a token budget.
+
+    Args:
+        segments (list): Segment strings in document order
+        max_tokens (int): Token budget per chunk
+
+    Returns:
+        list: Chunk strings, each made of whole segments where possible
+    """
+    return ["\n\n".join(group)
+            for group in _pack_groups(_split_pieces(segments, max_tokens), max_tokens)]
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split a legal document into clause-aligned chunks within a token budget.
+
+    Args:
+        text (str): The document text
+        max_tokens (int): Token budget per chunk
+
+    Returns:
+        list: Chunk strings in document order
+    """
+    return pack_segments(split_into_segments(text), max_tokens)
+
+
+def segment_hash(segment):
+    """Hash a segment, ignoring differences in whitespace"""
+    normalized = re.sub(r"\s+", " ", segment).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def plan_chunks(text, max_tokens, previous_chunks=None, segments=None):
+    """
+    Split a document into chunks, reusing chunks from an earlier version.
+
+    A chunk of the earlier version is kept whenever its exact run of segments
+    still appears in the new text, and its stored simplification is returned
+    with it. Only the segments between kept chunks are packed into new chunks,
+    so an edit to one clause leaves the boundaries of the other chunks intact.
+
+    Args:
+        text (str): The document text
+        max_tokens (int): Token budget per chunk
+        previous_chunks (list): (segment_hashes, simplified_text) pairs from
+            the earlier version, in document order
+        segments (list): The document's segments when they are already
+            known, so the text is not split again
+
+    Returns:
+        list: (segment_hashes, pieces, simplified_text) tuples in document
+            order, where pieces are the chunk's segments and simplified_text
+            is None for chunks that need simplifying
+    """
+    if segments is None:
+        segments = split_into_segments(text)
+    pieces = _split_pieces(segments, max_tokens)
+    hashes = [segment_hash(piece) for piece in pieces]
+
+    # Index earlier chunks by their first segment
+    candidates = {}
+    for chunk_hashes, simplified_text in previous_chunks or []:
+        if chunk_hashes:
+            candidates.setdefault(chunk_hashes[0], []).append(
+                (tuple(chunk_hashes), simplified_text))
+
+    plan = []
+    pending = []
+
+    def flush():
+        start = pending[0] if pending else 0
+        for group in _pack_groups([pieces[i] for i in pending], max_tokens):
+            plan.append((tuple(hashes[start:start + len(group)]), tuple(group), None))
+            start += len(group)
+        pending.clear()
+
+    i = 0
+    while i < len(pieces):
+        match = next(
+            (candidate for candidate in candidates.get(hashes[i], [])
+             if tuple(hashes[i:i + len(candidate[0])]) == candidate[0]),
+            None
+        )
+        if match:
+            flush()
+            chunk_hashes, simplified_text = match
+            plan.append((chunk_hashes, tuple(pieces[i:i + len(chunk_hashes)]), simplified_text))
+            i += len(chunk_hashes)
+        else:
+            pending.append(i)
+            i += 1
+    flush()
+    return plan
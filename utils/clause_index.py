@@ -0,0 +1,255 @@
+import hashlib
+import random
+import re
+import time
+from array import array
+from collections import Counter
+import streamlit as st
+from utils.result_cache import normalize_text
+from utils.sqlite_pool import BufferedCounters, ConnectionPool
+
+# Estimated Jaccard similarity above which a stored clause simplification is reused
+CLAUSE_SIMILARITY_THRESHOLD = 0.8
+
+# MinHash signature length, split into LSH bands of equal size
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# Clauses shorter than this are too generic to match reliably
+MIN_CLAUSE_WORDS = 12
+
+# Mersenne prime modulus of the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(MINHASH_PERMUTATIONS)]
+
+# Numbers, amounts, dates and capitalized names that must match exactly
+KEY_TERM_PATTERN = re.compile(r"\b(?:\d[\d,./%-]*|[A-Z][\w-]*)")
+
+# Negations and modal words that reverse or change an obligation; their counts must match exactly
+POLARITY_TERMS = ("not", "no", "nor", "never", "without", "except", "unless",
+                  "shall", "may", "must", "only", "cannot")
+POLARITY_PATTERN = re.compile(rf"\b(?:{'|'.join(POLARITY_TERMS)})\b|n't\b", re.IGNORECASE)
+
+
+def _shingles(text):
+    """Lowercase word shingles of a clause"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < MIN_CLAUSE_WORDS:
+        return set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingles):
+    """
+    Compute the MinHash signature of a set of shingles.
+
+    Args:
+        shingles (set): Shingle strings
+
+    Returns:
+        list: MINHASH_PERMUTATIONS minimum hash values
+    """
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in shingles]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _band_keys(signature):
+    """LSH bucket keys, one per band of the signature"""
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    return [
+        f"{band}:" + hashlib.blake2b(
+            array("Q", signature[band * rows:(band + 1) * rows]).tobytes(), digest_size=8
+        ).hexdigest()
+        for band in range(LSH_BANDS)
+    ]
+
+
+def key_terms(text):
+    """
+    Collect the terms of a clause whose change alters its meaning.
+
+    Numbers, dates and names are collected as written. Negations and modal
+    words are counted, so "shall assign" and "shall not assign" never match.
+    """
+    terms = set(KEY_TERM_PATTERN.findall(text))
+    polarity = Counter("not" if word.lower() in ("n't", "cannot") else word.lower()
+                       for word in POLARITY_PATTERN.findall(text))
+    terms.update(polarity.items())
+    return terms
+
+
+class ClauseIndex:
+    """
+    Locality-sensitive hashing index of simplified clauses.
+
+    Stored in the history database so clauses simplified for any earlier
+    document can be reused. Clauses are matched by the estimated Jaccard
+    similarity of their word shingles; numbers, dates and names must match
+    exactly so a clause naming a different party or amount is never reused.
+    """
+
+    def __init__(self, db_path="./data/history.db", threshold=CLAUSE_SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.pool = ConnectionPool(db_path)
+        # Lookups are counted in memory and written in batches, so they never take the write lock
+        self.counters = BufferedCounters("clause_stats")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the necessary tables if they don't exist."""
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS clause_index (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                clause_text TEXT NOT NULL,
+                simplified_text TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                seconds REAL NOT NULL,
+                created REAL NOT NULL,
+                UNIQUE (model, text_hash)
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS clause_bands (
+                model TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                clause_id INTEGER NOT NULL
+            )
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS clause_bands_lookup ON clause_bands (model, bucket)
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS clause_stats (
+                name TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            )
+            ''')
+            cursor.execute('''
+            INSERT OR IGNORE INTO clause_stats (name, value)
+            VALUES ('lookups', 0), ('hits', 0), ('seconds_saved', 0)
+            ''')
+
+    @staticmethod
+    def _text_hash(text):
+        """Hash a clause, ignoring differences in whitespace"""
+        return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+    def add(self, clause_text, simplified_text, model, seconds):
+        """
+        Index the simplification of a clause.
+
+        Args:
+            clause_text (str): The original clause
+            simplified_text (str): Its simplification
+            model (str): Model that produced the simplification
+            seconds (float): Generation time attributed to the clause
+        """
+        shingles = _shingles(clause_text)
+        if not shingles or not simplified_text.strip():
+            return
+
+        signature = minhash(shingles)
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            INSERT OR IGNORE INTO clause_index
+                (model, text_hash, clause_text, simplified_text, signature, seconds, created)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (model, self._text_hash(clause_text), clause_text, simplified_text,
+                  array("Q", signature).tobytes(), seconds, time.time()))
+            if cursor.rowcount:
+                clause_id = cursor.lastrowid
+                cursor.executemany('''
+                INSERT INTO clause_bands (model, bucket, clause_id) VALUES (?, ?, ?)
+                ''', [(model, bucket, clause_id) for bucket in _band_keys(signature)])
+
+    def find(self, clause_text, model):
+        """
+        Find the stored simplification of a near-duplicate clause.
+
+        Args:
+            clause_text (str): The clause to simplify
+            model (str): Model the simplification must come from
+
+        Returns:
+            tuple: (simplified_text, seconds) of the most similar clause, or
+                None if no indexed clause is similar enough
+        """
+        best = None
+        shingles = _shingles(clause_text)
+        if shingles:
+            best = self._best_match(minhash(shingles), key_terms(clause_text), model)
+
+        due = self.counters.add("lookups")
+        if best:
+            self.counters.add("hits")
+            due = self.counters.add("seconds_saved", best[1])
+        if due:
+            self.flush()
+        return best
+
+    def flush(self):
+        """Write the buffered lookup counters."""
+        with self.pool.write() as cursor:
+            self.counters.write(cursor)
+
+    def _best_match(self, signature, terms, model):
+        """Find the most similar indexed clause among those sharing an LSH bucket."""
+        buckets = _band_keys(signature)
+        with self.pool.read() as cursor:
+            cursor.execute(f'''
+            SELECT clause_text, simplified_text, signature, seconds FROM clause_index
+            WHERE id IN (
+                SELECT clause_id FROM clause_bands
+                WHERE model = ? AND bucket IN ({", ".join("?" * len(buckets))})
+            )
+            ''', (model, *buckets))
+            candidates = cursor.fetchall()
+
+        best = None
+        best_similarity = self.threshold
+        for candidate_text, simplified_text, blob, seconds in candidates:
+            stored = array("Q")
+            stored.frombytes(blob)
+            similarity = sum(x == y for x, y in zip(signature, stored)) / MINHASH_PERMUTATIONS
+            if similarity >= best_similarity and key_terms(candidate_text) == terms:
+                best = (simplified_text, seconds)
+                best_similarity = similarity
+        return best
+
+    def stats(self):
+        """Return lookup/hit counters, time saved and the number of indexed clauses."""
+        with self.pool.read() as cursor:
+            cursor.execute('SELECT name, value FROM clause_stats')
+            stats = self.counters.merge(dict(cursor.fetchall()))
+            cursor.execute('SELECT COUNT(*) FROM clause_index')
+            stats["clauses"] = cursor.fetchone()[0]
+        return stats
+
+    def clear(self):
+        """Delete all indexed clauses and reset the counters."""
+        self.counters.clear()
+        with self.pool.write() as cursor:
+            cursor.execute('DELETE FROM clause_bands')
+            cursor.execute('DELETE FROM clause_index')
+            cursor.execute('UPDATE clause_stats SET value = 0')
+
+    def close(self):
+        """Write buffered counters and close the database connections."""
+        self.flush()
+        self.pool.close()
+
+
+@st.cache_resource
+def get_clause_index():
+    """Get or create the shared clause index"""
+    return ClauseIndex()
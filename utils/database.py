@@ -1,51 +1,79 @@
-import sqlite3
-import os
 import json
 from datetime import datetime
+from utils.sqlite_pool import ConnectionPool
 
 
 class HistoryDatabase:
-    def __init__(self, db_path="./data/history.db"):
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    """
+    History of simplified documents.
+
+    Shared by every session and background job; each call borrows a pooled
+    connection and uses its own cursor, so concurrent sessions can read
+    while one writes.
+    """
 
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_path="./data/history.db"):
+        self.pool = ConnectionPool(db_path)
         self.create_tables()
 
     def create_tables(self):
         """Create the necessary tables if they don't exist."""
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            input_text TEXT NOT NULL,
-            simplified_text TEXT,
-            translated_text TEXT,
-            language TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            title TEXT
-        )
-        ''')
-        self.conn.commit()
-
-    def add_entry(self, input_text, simplified_text=None, translated_text=None, language=None):
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                input_text TEXT NOT NULL,
+                simplified_text TEXT,
+                translated_text TEXT,
+                language TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                title TEXT
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS entry_chunks (
+                entry_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                segment_hashes TEXT NOT NULL,
+                simplified_text TEXT NOT NULL,
+                PRIMARY KEY (entry_id, position)
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS translations (
+                entry_id INTEGER NOT NULL,
+                language TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (entry_id, language)
+            )
+            ''')
+
+    def add_entry(self, input_text, simplified_text=None, translated_text=None, language=None, title=None):
         """Add a new entry to the history database."""
-        # Create a title from the first 30 chars of input
-        title = input_text[:30] + "..." if len(input_text) > 30 else input_text
-
-        self.cursor.execute('''
-        INSERT INTO history (input_text, simplified_text, translated_text, language, title)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (input_text, simplified_text, translated_text, language, title))
-        self.conn.commit()
-        return self.cursor.lastrowid
-
-    def update_entry(self, entry_id, simplified_text=None, translated_text=None, language=None):
+        # Create a title from the first 30 chars of input unless one is given
+        if not title:
+            title = input_text[:30] + "..." if len(input_text) > 30 else input_text
+
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            INSERT INTO history (input_text, simplified_text, translated_text, language, title)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (input_text, simplified_text, translated_text, language, title))
+            return cursor.lastrowid
+
+    def update_entry(self, entry_id, simplified_text=None, translated_text=None, language=None,
+                     input_text=None):
         """Update an existing history entry."""
         # Build the update query dynamically based on which fields are provided
         update_fields = []
         update_values = []
 
+        if input_text is not None:
+            update_fields.append("input_text = ?")
+            update_values.append(input_text)
+
         if simplified_text is not None:
             update_fields.append("simplified_text = ?")
             update_values.append(simplified_text)
@@ -69,39 +97,96 @@ class HistoryDatabase:
         WHERE id = ?
         '''
 
-        self.cursor.execute(query, update_values)
-        self.conn.commit()
+        with self.pool.write() as cursor:
+            cursor.execute(query, update_values)
+
+    def get_entry_chunks(self, entry_id, model):
+        """Retrieve the simplified chunks stored for an entry and model."""
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT segment_hashes, simplified_text FROM entry_chunks
+            WHERE entry_id = ? AND model = ?
+            ORDER BY position
+            ''', (entry_id, model))
+            rows = cursor.fetchall()
+        return [(json.loads(hashes), simplified_text) for hashes, simplified_text in rows]
+
+    def replace_entry_chunks(self, entry_id, model, chunks):
+        """Replace the simplified chunks stored for an entry."""
+        rows = [(entry_id, position, model, json.dumps(hashes), simplified_text)
+                for position, (hashes, simplified_text) in enumerate(chunks)]
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            DELETE FROM entry_chunks WHERE entry_id = ?
+            ''', (entry_id,))
+            cursor.executemany('''
+            INSERT INTO entry_chunks (entry_id, position, model, segment_hashes, simplified_text)
+            VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+
+    def get_translations(self, entry_id):
+        """Retrieve every stored translation of an entry, keyed by language."""
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT language, translated_text FROM translations WHERE entry_id = ?
+            ''', (entry_id,))
+            return dict(cursor.fetchall())
+
+    def save_translation(self, entry_id, language, translated_text):
+        """Store the translation of an entry, replacing any earlier one in that language."""
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            INSERT OR REPLACE INTO translations (entry_id, language, translated_text)
+            VALUES (?, ?, ?)
+            ''', (entry_id, language, translated_text))
+
+    def delete_translations(self, entry_id):
+        """Delete every translation of an entry, e.g. after it is simplified again."""
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            DELETE FROM translations WHERE entry_id = ?
+            ''', (entry_id,))
 
     def delete_entry(self, entry_id):
         """Delete a history entry by ID."""
-        self.cursor.execute('''
-        DELETE FROM history WHERE id = ?
-        ''', (entry_id,))
-        self.conn.commit()
-        return self.cursor.rowcount > 0  # Return True if a row was deleted
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            DELETE FROM entry_chunks WHERE entry_id = ?
+            ''', (entry_id,))
+            cursor.execute('''
+            DELETE FROM translations WHERE entry_id = ?
+            ''', (entry_id,))
+            cursor.execute('''
+            DELETE FROM history WHERE id = ?
+            ''', (entry_id,))
+            return cursor.rowcount > 0  # Return True if a row was deleted
 
     def delete_all_entries(self):
         """Delete all history entries."""
-        self.cursor.execute('DELETE FROM history')
-        self.conn.commit()
-        return self.cursor.rowcount
+        with self.pool.write() as cursor:
+            cursor.execute('DELETE FROM entry_chunks')
+            cursor.execute('DELETE FROM translations')
+            cursor.execute('DELETE FROM history')
+            return cursor.rowcount
 
     def get_entry(self, entry_id):
         """Retrieve a specific history entry."""
-        self.cursor.execute('''
-        SELECT * FROM history WHERE id = ?
-        ''', (entry_id,))
-        return self.cursor.fetchone()
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT * FROM history WHERE id = ?
+            ''', (entry_id,))
+            return cursor.fetchone()
 
     def get_all_entries(self, limit=10):
         """Retrieve all history entries, sorted by most recent first."""
-        self.cursor.execute('''
-        SELECT id, title, timestamp FROM history
-        ORDER BY timestamp DESC
-        LIMIT ?
-        ''', (limit,))
-        return self.cursor.fetchall()
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT id, title, timestamp FROM history
+            ORDER BY timestamp DESC
+            LIMIT ?
+            ''', (limit,))
+            return cursor.fetchall()
 
     def close(self):
-        """Close the database connection."""
-        self.conn.close()
+        """Close the database connections."""
+        self.pool.close()
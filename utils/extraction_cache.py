@@ -0,0 +1,134 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import streamlit as st
+from utils.file_extractor import EXTRACTOR_VERSION, extract_document, iter_extracted_files
+from utils.single_flight import inflight
+
+# Total size of cached extractions before least recently used files are evicted
+EXTRACTION_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+
+class ExtractionCache:
+    """
+    In-memory cache of extraction results of uploaded files.
+
+    Entries are keyed by the hash of the file contents and the extractor
+    version, so a file is parsed once no matter how often the app reruns or
+    how many sessions upload it. Least recently used files are evicted once
+    the cached results exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes=EXTRACTION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(file_bytes):
+        """Hash file contents together with the extractor version"""
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        return f"v{EXTRACTOR_VERSION}:{digest}"
+
+    def get(self, key):
+        """Return the cached result for a key, or None, marking it recently used."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        """Cache an extraction result, evicting least recently used files to stay within budget."""
+        size = result.nbytes()
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self.entries[key] = (result, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def extract(self, file_bytes, file_name, file_type=None):
+        """
+        Extract file contents, parsing each distinct file only once.
+
+        Args:
+            file_bytes (bytes): Raw file contents
+            file_name (str): File name, used when the MIME type is unknown
+            file_type (str): MIME type, if known
+
+        Returns:
+            ExtractionResult: Extracted text and segments or None if extraction failed
+        """
+        key = self.make_key(file_bytes)
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        # Sessions uploading the same file at the same time share one parse
+        result = inflight.do(f"extract\0{key}", extract_document, file_bytes, file_name, file_type)
+        if result and result.text:
+            # Failures are not cached so their error is shown again on the next attempt
+            self.put(key, result)
+        return result
+
+    def extract_many(self, files, max_workers=None):
+        """
+        Extract several files, parsing the uncached ones concurrently.
+
+        Args:
+            files (list): (file_name, file_bytes) pairs
+            max_workers (int): Worker processes, defaults to the CPU count
+
+        Yields:
+            tuple: (index, result) for each file as it finishes, where index is
+                its position in files and result is None if extraction failed
+        """
+        keys = [self.make_key(file_bytes) for _, file_bytes in files]
+        missing = []
+        for index, key in enumerate(keys):
+            result = self.get(key)
+            if result is not None:
+                yield index, result
+            else:
+                missing.append(index)
+
+        for position, result in iter_extracted_files([files[index] for index in missing], max_workers):
+            index = missing[position]
+            if result and result.text:
+                self.put(keys[index], result)
+            yield index, result
+
+    def stats(self):
+        """Return hit/miss counters, the number of cached files and their size."""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        """Drop every cached extraction."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+@st.cache_resource
+def get_extraction_cache():
+    """Get or create the extraction cache shared by every session"""
+    return ExtractionCache()
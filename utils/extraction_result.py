@@ -0,0 +1,106 @@
+import re
+import sys
+
+# Separator placed between segments in the extracted text
+SEGMENT_SEPARATOR = "\n\n"
+
+# Single lines with at most this many words may be headings
+HEADING_MAX_WORDS = 12
+
+# Numbered or keyword headings, e.g. "4.2 Termination" or "ARTICLE IV"
+NUMBERED_HEADING_PATTERN = re.compile(r"^(\d+(?:\.\d+)*)\.?\s+\S")
+KEYWORD_HEADING_PATTERN = re.compile(
+    r"^(?:ARTICLE|Article|SECTION|Section|SCHEDULE|Schedule|EXHIBIT|Exhibit|"
+    r"ANNEXURE|Annexure|APPENDIX|Appendix)\s+[\dIVXLC]+\b"
+)
+
+# Approximate memory used by a Segment besides its text
+SEGMENT_OVERHEAD_BYTES = 96
+
+
+def guess_heading_level(text):
+    """
+    Guess the heading level of a block of plain text.
+
+    Args:
+        text (str): A paragraph of extracted text
+
+    Returns:
+        int: 1 for top-level headings, deeper levels for numbered
+            subsections such as "4.2", or None for body text
+    """
+    if "\n" in text or len(text.split()) > HEADING_MAX_WORDS or text.endswith((".", ";", ",")):
+        return None
+
+    numbered = NUMBERED_HEADING_PATTERN.match(text)
+    if numbered:
+        return numbered.group(1).count(".") + 1
+    if KEYWORD_HEADING_PATTERN.match(text) or (text.isupper() and any(c.isalpha() for c in text)):
+        return 1
+    return None
+
+
+class Segment:
+    """A paragraph, table row or heading of an extracted document and where it came from."""
+
+    __slots__ = ("text", "page", "index", "heading_level", "start", "end")
+
+    def __init__(self, text, page, index, heading_level, start, end):
+        self.text = text
+        self.page = page                    # 1-based page number, None if the format has no pages
+        self.index = index                  # Position among the document's segments
+        self.heading_level = heading_level  # 1 for top-level headings, None for body text
+        self.start = start                  # Offsets of the segment in ExtractionResult.text
+        self.end = end
+
+    def __repr__(self):
+        return (f"Segment(index={self.index}, page={self.page}, heading_level={self.heading_level}, "
+                f"start={self.start}, end={self.end}, text={self.text[:30]!r})")
+
+
+class ExtractionResult:
+    """
+    Text extracted from a document together with its segments.
+
+    The text is the segments joined by SEGMENT_SEPARATOR, and each segment
+    records its page, heading level and offsets in it.
+    """
+
+    def __init__(self, text, segments):
+        self.text = text
+        self.segments = segments
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """
+        Build a result in a single pass over extracted blocks.
+
+        Args:
+            blocks: Iterable of (text, page, heading_level) tuples in reading
+                order; blocks without text are skipped
+
+        Returns:
+            ExtractionResult: The joined text and its segments
+        """
+        parts = []
+        segments = []
+        offset = 0
+        for text, page, heading_level in blocks:
+            if not text:
+                continue
+            if parts:
+                parts.append(SEGMENT_SEPARATOR)
+                offset += len(SEGMENT_SEPARATOR)
+            segments.append(Segment(text, page, len(segments), heading_level, offset, offset + len(text)))
+            parts.append(text)
+            offset += len(text)
+        return cls("".join(parts), segments)
+
+    def headings(self):
+        """Return the segments that are headings, in document order"""
+        return [segment for segment in self.segments if segment.heading_level is not None]
+
+    def nbytes(self):
+        """Approximate memory held by the result, for cache budgets"""
+        return sys.getsizeof(self.text) + sum(
+            sys.getsizeof(segment.text) + SEGMENT_OVERHEAD_BYTES for segment in self.segments)
@@ -1,56 +1,321 @@
 import docx
+import multiprocessing
+import os
 import re
+import tempfile
+import zipfile
 import streamlit as st
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from utils.extraction_result import ExtractionResult, guess_heading_level
 
-def extract_text_from_txt(file_bytes):
-    """Extract text from a .txt file"""
+# File extensions the extractors can read
+SUPPORTED_EXTENSIONS = ('.txt', '.docx', '.pdf')
+
+# Largest total uncompressed size of the documents read from one ZIP archive
+MAX_ARCHIVE_BYTES = 512 * 1024 * 1024
+
+# Bump whenever an extractor's output changes, so cached extractions are not reused
+EXTRACTOR_VERSION = 3
+
+# WordprocessingML namespaces
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+# Paragraph styles of Word headings, e.g. "Heading2"
+HEADING_STYLE_PATTERN = re.compile(r"^[Hh]eading\s?(\d)$")
+
+# Separator between the cells of a table row
+TABLE_CELL_SEPARATOR = " | "
+
+# Run elements that stand for a character
+RUN_SYMBOLS = {
+    W_NS + "tab": "\t",
+    W_NS + "br": "\n",
+    W_NS + "cr": "\n",
+    W_NS + "noBreakHyphen": "-",
+}
+
+# PDFs with at least this many pages are extracted by a process pool
+PDF_PARALLEL_MIN_PAGES = 32
+
+# Pages a worker extracts per task
+PDF_PAGES_PER_TASK = 8
+
+# Path and PDF reader of the file a pool worker last read, kept for its next batch of pages
+_worker_pdf = (None, None)
+
+# Batches of pages in flight per PDF; set to 1 in pool workers so they read PDFs page by page
+_pdf_max_workers = None
+
+def _text_blocks(text, page=None):
+    """Split plain text on blank lines into (text, page, heading_level) blocks"""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if paragraph:
+            yield paragraph, page, guess_heading_level(paragraph)
+
+def extract_txt(file_bytes):
+    """Extract the paragraphs of a .txt file"""
     try:
         text = file_bytes.decode('utf-8')
-        return text
     except UnicodeDecodeError:
         # Try different encodings if UTF-8 fails
         try:
             text = file_bytes.decode('latin-1')
-            return text
         except Exception as e:
             st.error(f"Error reading .txt file: {str(e)}")
             return None
+    return ExtractionResult.from_blocks(_text_blocks(text))
 
-def extract_text_from_docx(file_bytes):
-    """Extract text from a .docx file"""
-    try:
-        doc = docx.Document(BytesIO(file_bytes))
-        full_text = []
-        
-        # Extract text from paragraphs
-        for para in doc.paragraphs:
-            if para.text.strip():  # Skip empty paragraphs
-                full_text.append(para.text)
+def extract_text_from_txt(file_bytes):
+    """Extract text from a .txt file"""
+    result = extract_txt(file_bytes)
+    return result.text if result else None
+
+def _docx_parts(names):
+    """Parts holding text, in the order they are read: headers, body, notes, then footers"""
+    def numbered(prefix):
+        pattern = re.compile(rf"word/{prefix}(\d*)\.xml$")
+        matches = [(int(match.group(1) or 0), name)
+                   for name, match in ((name, pattern.match(name)) for name in names) if match]
+        return [name for _, name in sorted(matches)]
+
+    notes = [name for name in ("word/footnotes.xml", "word/endnotes.xml") if name in names]
+    return numbered("header") + ["word/document.xml"] + notes + numbered("footer")
+
+def _iter_docx_part(stream):
+    """
+    Yield (text, heading_level) for the paragraphs and table rows of one WordprocessingML part
+    
+    Elements are cleared as soon as their text is read, so memory use does
+    not grow with the length of the document.
+    """
+    from lxml import etree
+
+    paragraphs = []  # [runs, heading level] of the open paragraphs; text boxes nest paragraphs
+    tables = []      # Open tables as [cells of the current row, paragraphs of the current cell]
+    fallback_depth = 0
+
+    for event, elem in etree.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == W_NS + "p":
+                paragraphs.append([[], None])
+            elif tag == W_NS + "tbl":
+                tables.append([[], []])
+            elif tag == W_NS + "tr":
+                tables[-1][0] = []
+            elif tag == W_NS + "tc":
+                tables[-1][1] = []
+            elif tag == MC_NS + "Fallback":
+                # Alternate renderings repeat the text of the preferred choice
+                fallback_depth += 1
+            continue
+
+        if tag == W_NS + "t" or tag in RUN_SYMBOLS:
+            if paragraphs and not fallback_depth:
+                paragraphs[-1][0].append(elem.text or "" if tag == W_NS + "t" else RUN_SYMBOLS[tag])
+            continue
+
+        # Headings are marked by their paragraph style or an explicit outline level
+        if tag == W_NS + "pStyle" and paragraphs:
+            style = HEADING_STYLE_PATTERN.match(elem.get(W_NS + "val") or "")
+            if style:
+                paragraphs[-1][1] = int(style.group(1))
+            continue
+        if tag == W_NS + "outlineLvl" and paragraphs:
+            level = int(elem.get(W_NS + "val") or 9)
+            # Level 9 is body text
+            paragraphs[-1][1] = level + 1 if level < 9 else None
+            continue
+
+        if tag == MC_NS + "Fallback":
+            fallback_depth -= 1
+            continue
+        elif tag == W_NS + "p":
+            runs, heading_level = paragraphs.pop()
+            text = "".join(runs).strip()
+            if text and tables and not paragraphs:
+                tables[-1][1].append(text)
+            elif text:
+                yield text, heading_level
+        elif tag == W_NS + "tc":
+            tables[-1][0].append(" ".join(tables[-1][1]))
+        elif tag == W_NS + "tr":
+            cells = tables[-1][0]
+            row = TABLE_CELL_SEPARATOR.join(cells) if any(cells) else ""
+            if row and len(tables) > 1:
+                # Rows of a nested table belong to the enclosing cell
+                tables[-2][1].append(row)
+            elif row:
+                yield row, None
+        elif tag == W_NS + "tbl":
+            tables.pop()
+        else:
+            continue
+
+        if not paragraphs and len(tables) <= 1:
+            # Free the finished element and its earlier siblings
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+def iter_docx_blocks(file_bytes):
+    """
+    Yield the text of a .docx file block by block in reading order
+    
+    Paragraphs and table rows are streamed from the document XML, with
+    cells separated by TABLE_CELL_SEPARATOR. Header text comes first, then
+    the body, footnotes and endnotes, and footer text last; headers and
+    footers shared by several sections are emitted once. Word documents
+    have no fixed pages, so blocks carry no page number.
+    
+    Args:
+        file_bytes (bytes): Raw file contents
         
-        # Add double linebreaks between paragraphs for readability
-        return '\n\n'.join(full_text)
+    Yields:
+        tuple: (text, page, heading_level) of each paragraph or table row
+    """
+    with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+        seen_furniture = set()
+        for name in _docx_parts(set(archive.namelist())):
+            with archive.open(name) as stream:
+                if not name.startswith(("word/header", "word/footer")):
+                    for text, heading_level in _iter_docx_part(stream):
+                        yield text, None, heading_level
+                    continue
+
+                # Headers and footers are small; read them whole to skip repeats
+                blocks = tuple(_iter_docx_part(stream))
+                if blocks and blocks not in seen_furniture:
+                    seen_furniture.add(blocks)
+                    for text, heading_level in blocks:
+                        yield text, None, heading_level
+
+def _python_docx_blocks(file_bytes):
+    """Read paragraphs with python-docx for packages that cannot be streamed"""
+    doc = docx.Document(BytesIO(file_bytes))
+    for para in doc.paragraphs:
+        if para.text.strip():  # Skip empty paragraphs
+            style = HEADING_STYLE_PATTERN.match(para.style.style_id or "") if para.style is not None else None
+            yield para.text, None, int(style.group(1)) if style else None
+
+def extract_docx(file_bytes):
+    """Extract the paragraphs and table rows of a .docx file"""
+    try:
+        # Stream the XML directly; fall back to python-docx if the package is unusual
+        return ExtractionResult.from_blocks(iter_docx_blocks(file_bytes))
+    except Exception:
+        pass
+
+    try:
+        return ExtractionResult.from_blocks(_python_docx_blocks(file_bytes))
     except Exception as e:
         st.error(f"Error reading .docx file: {str(e)}")
         return None
 
-def extract_text_from_pdf(file_bytes):
-    """Extract text from a .pdf file"""
-    try:
-        # Install PyPDF2 if not already in requirements
-        import PyPDF2
-        from io import BytesIO
-        
-        pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-        text = []
-        
-        # Extract text from each page
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text.append(page.extract_text())
+def extract_text_from_docx(file_bytes):
+    """Extract text from a .docx file"""
+    result = extract_docx(file_bytes)
+    return result.text if result else None
+
+def _init_extraction_worker():
+    """Read PDFs page by page inside pool workers instead of submitting to the pool from it"""
+    global _pdf_max_workers
+    _pdf_max_workers = 1
+
+def _pool_context():
+    """Start workers from a clean server process; forking the threaded Streamlit server can deadlock them"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+@st.cache_resource
+def get_extraction_pool():
+    """Get the process pool shared by every PDF and multi-file extraction"""
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=_pool_context(),
+                               initializer=_init_extraction_worker)
+
+def _extract_pdf_pages(path, start, stop):
+    """Extract the text of a range of pages in a pool worker, opening each file once per worker"""
+    import PyPDF2
+
+    global _worker_pdf
+    if _worker_pdf[0] != path:
+        _worker_pdf = (path, PyPDF2.PdfReader(path))
+    reader = _worker_pdf[1]
+    return [reader.pages[page_num].extract_text() or "" for page_num in range(start, stop)]
+
+def iter_pdf_pages(file_bytes, max_workers=None):
+    """
+    Yield the text of each page of a .pdf file, in order, as it is extracted
+    
+    Small files are read page by page in this process. Large files are
+    written to a temporary file and spread over the shared extraction pool
+    in batches of pages; only a few batches are extracted ahead of the
+    consumer, so the first pages can be segmented while the pool is still
+    parsing the last ones, and the raw page text of a large file is never
+    held in memory all at once.
+    
+    Args:
+        file_bytes (bytes): Raw file contents
+        max_workers (int): Batches of pages in flight are twice this,
+            defaults to the CPU count
         
-        # Join all pages with double linebreaks
-        return '\n\n'.join(text)
+    Yields:
+        str: Text of each page
+    """
+    # Install PyPDF2 if not already in requirements
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+    page_count = len(pdf_reader.pages)
+    max_workers = max_workers or _pdf_max_workers or os.cpu_count() or 1
+
+    if page_count < PDF_PARALLEL_MIN_PAGES or max_workers < 2:
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    tasks = iter([(start, min(start + PDF_PAGES_PER_TASK, page_count))
+                  for start in range(0, page_count, PDF_PAGES_PER_TASK)])
+
+    # Workers read the file from disk, so the bytes are not sent with every batch
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+        pdf_file.write(file_bytes)
+
+    executor = get_extraction_pool()
+    pending = deque()
+    try:
+        # Keep two batches per worker in flight, submitting one more as each is consumed
+        pending.extend(executor.submit(_extract_pdf_pages, pdf_file.name, *task)
+                       for _, task in zip(range(max_workers * 2), tasks))
+        while pending:
+            pages = pending.popleft().result()
+            task = next(tasks, None)
+            if task:
+                pending.append(executor.submit(_extract_pdf_pages, pdf_file.name, *task))
+            yield from pages
+    except BrokenProcessPool:
+        # A worker died; the next extraction starts a new pool
+        get_extraction_pool.clear()
+        raise
+    finally:
+        # A consumer that stops early leaves no batches behind in the shared pool
+        for future in pending:
+            future.cancel()
+        os.remove(pdf_file.name)
+
+def extract_pdf(file_bytes):
+    """Extract the paragraphs of a .pdf file with their page numbers"""
+    try:
+        return ExtractionResult.from_blocks(
+            block
+            for page_num, page_text in enumerate(iter_pdf_pages(file_bytes), start=1)
+            for block in _text_blocks(page_text, page_num)
+        )
     except ImportError:
         st.error("PyPDF2 is required for PDF extraction. Please install it using: pip install PyPDF2")
         return None
@@ -58,6 +323,51 @@ def extract_text_from_pdf(file_bytes):
         st.error(f"Error reading PDF file: {str(e)}")
         return None
 
+def extract_text_from_pdf(file_bytes):
+    """Extract text from a .pdf file"""
+    result = extract_pdf(file_bytes)
+    return result.text if result else None
+
+def extract_document(file_bytes, file_name, file_type=None):
+    """
+    Extract the structured text of file contents based on file type or extension
+    
+    Args:
+        file_bytes (bytes): Raw file contents
+        file_name (str): File name, used when the MIME type is unknown
+        file_type (str): MIME type, if known
+        
+    Returns:
+        ExtractionResult: Extracted text and segments or None if extraction failed
+    """
+    file_name = file_name.lower()
+
+    # Extract text based on file type
+    if file_type == "text/plain" or file_name.endswith('.txt'):
+        return extract_txt(file_bytes)
+    elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document" or file_name.endswith('.docx'):
+        return extract_docx(file_bytes)
+    elif file_type == "application/pdf" or file_name.endswith('.pdf'):
+        return extract_pdf(file_bytes)
+    else:
+        st.error(f"Unsupported file type: {file_type}. Please upload a .txt, .docx, or .pdf file.")
+        return None
+
+def extract_text_from_bytes(file_bytes, file_name, file_type=None):
+    """
+    Extract text from file contents based on file type or extension
+    
+    Args:
+        file_bytes (bytes): Raw file contents
+        file_name (str): File name, used when the MIME type is unknown
+        file_type (str): MIME type, if known
+        
+    Returns:
+        str: Extracted text or None if extraction failed
+    """
+    result = extract_document(file_bytes, file_name, file_type)
+    return result.text if result else None
+
 def extract_text_from_file(uploaded_file):
     """
     Extract text from uploaded file based on file type
@@ -73,16 +383,82 @@ def extract_text_from_file(uploaded_file):
         
     # Read file bytes
     file_bytes = uploaded_file.read()
-    file_type = uploaded_file.type
-    file_name = uploaded_file.name
+    return extract_text_from_bytes(file_bytes, uploaded_file.name, uploaded_file.type)
+
+def expand_archives(files):
+    """
+    Replace ZIP archives with the supported documents inside them
     
-    # Extract text based on file type
-    if file_type == "text/plain" or file_name.endswith('.txt'):
-        return extract_text_from_txt(file_bytes)
-    elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document" or file_name.endswith('.docx'):
-        return extract_text_from_docx(file_bytes)
-    elif file_type == "application/pdf" or file_name.endswith('.pdf'):
-        return extract_text_from_pdf(file_bytes)
-    else:
-        st.error(f"Unsupported file type: {file_type}. Please upload a .txt, .docx, or .pdf file.")
-        return None
\ No newline at end of file
+    Args:
+        files (list): (file_name, file_bytes) pairs
+        
+    Returns:
+        list: (file_name, file_bytes) pairs of documents to extract; documents
+            from an archive are named after the archive and their path in it
+    """
+    documents = []
+    for file_name, file_bytes in files:
+        if not file_name.lower().endswith('.zip'):
+            documents.append((file_name, file_bytes))
+            continue
+
+        try:
+            with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not info.is_dir()
+                    and info.filename.lower().endswith(SUPPORTED_EXTENSIONS)
+                    and not info.filename.startswith('__MACOSX/')
+                    and not os.path.basename(info.filename).startswith('.')
+                ]
+                # Refuse archives that would expand beyond the limit before reading any of them
+                if sum(info.file_size for info in members) > MAX_ARCHIVE_BYTES:
+                    st.error(f"{file_name} is too large to extract "
+                             f"(over {MAX_ARCHIVE_BYTES // (1024 * 1024)} MB uncompressed).")
+                    continue
+                for info in members:
+                    documents.append((f"{file_name}/{info.filename}", archive.read(info)))
+        except Exception as e:
+            st.error(f"Error reading ZIP archive {file_name}: {str(e)}")
+    return documents
+
+def iter_extracted_files(files, max_workers=None):
+    """
+    Extract several files concurrently with the shared extraction pool
+    
+    Args:
+        files (list): (file_name, file_bytes) pairs
+        max_workers (int): 1 extracts the files in this process, defaults
+            to the CPU count
+        
+    Yields:
+        tuple: (index, result) for each file as it finishes, where index is
+            its position in files and result is its ExtractionResult, or
+            None if extraction failed
+    """
+    max_workers = min(max_workers or os.cpu_count() or 1, len(files))
+    if max_workers < 2:
+        for index, (file_name, file_bytes) in enumerate(files):
+            yield index, extract_document(file_bytes, file_name)
+        return
+
+    executor = get_extraction_pool()
+    futures = {
+        executor.submit(extract_document, file_bytes, file_name): index
+        for index, (file_name, file_bytes) in enumerate(files)
+    }
+    try:
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # A worker died; the next extraction starts a new pool
+                get_extraction_pool.clear()
+                result = None
+            except Exception:
+                result = None
+            yield futures[future], result
+    finally:
+        # A consumer that stops early leaves no files behind in the shared pool
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,237 @@
+import threading
+import time
+from contextlib import contextmanager
+import httpx
+import requests
+import streamlit as st
+from utils.ollama_config import (
+    create_async_client,
+    ollama_get,
+    OLLAMA_API_HOSTS,
+    HOST_HEALTH_INTERVAL,
+    MAX_PARALLEL_REQUESTS,
+)
+
+# Weight of the newest probe in each host's smoothed latency
+LATENCY_SMOOTHING = 0.3
+
+# Errors that mean a host could not be reached, as opposed to a bad request
+CONNECTION_ERRORS = (ConnectionError, httpx.TransportError, requests.ConnectionError)
+
+
+def _model_matches(name, model):
+    """Check if an installed model name is the requested model, ignoring the tag if none is given"""
+    return name == model or (":" not in model and name.split(":")[0] == model)
+
+
+class HostPool:
+    """
+    Routes Ollama requests across several servers.
+
+    Each request goes to the healthy host with the fewest requests
+    outstanding, preferring hosts that already have the model loaded so it
+    is not loaded a second time elsewhere. A background thread probes every
+    host's /api/tags and /api/ps; hosts that fail a probe or a request are
+    ejected until a probe succeeds again.
+    """
+
+    def __init__(self, hosts=None, interval=HOST_HEALTH_INTERVAL, slots=MAX_PARALLEL_REQUESTS):
+        self.interval = interval
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.hosts = {
+            host: {
+                "healthy": True,
+                "outstanding": 0,
+                "requests": 0,
+                "latency": None,
+                "installed": set(),
+                "loaded": set(),
+                "checked_at": 0,
+                "error": None,
+            }
+            for host in (hosts or OLLAMA_API_HOSTS)
+        }
+        self.started = False
+
+    def probe(self, host):
+        """Check a host's health and record its installed and loaded models."""
+        started = time.time()
+        try:
+            response = ollama_get("/api/tags", host)
+            response.raise_for_status()
+            latency = time.time() - started
+            installed = {m["name"] for m in response.json().get("models", []) if "name" in m}
+
+            response = ollama_get("/api/ps", host)
+            loaded = {m["name"] for m in response.json().get("models", []) if "name" in m} \
+                if response.status_code == 200 else set()
+
+            with self.lock:
+                state = self.hosts[host]
+                previous = state["latency"]
+                state.update(
+                    healthy=True,
+                    error=None,
+                    installed=installed,
+                    loaded=loaded,
+                    latency=latency if previous is None
+                    else previous + LATENCY_SMOOTHING * (latency - previous),
+                )
+        except Exception as e:
+            self.mark_unhealthy(host, e)
+        finally:
+            with self.lock:
+                self.hosts[host]["checked_at"] = time.time()
+
+    def check_all(self):
+        """Probe every host concurrently and wait for the results."""
+        threads = [threading.Thread(target=self.probe, args=(host,), daemon=True) for host in self.hosts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def start(self):
+        """Probe every host now, then keep probing in a background thread."""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+
+        self.check_all()
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                self.check_all()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def mark_unhealthy(self, host, error):
+        """Eject a host from routing until its next successful probe."""
+        with self.lock:
+            self.hosts[host].update(healthy=False, error=str(error))
+
+    def healthy_hosts(self):
+        """Return the hosts currently accepting requests."""
+        with self.lock:
+            return [host for host, state in self.hosts.items() if state["healthy"]]
+
+    def capacity(self):
+        """Get the number of requests the healthy hosts can run in parallel"""
+        return self.slots * max(1, len(self.healthy_hosts()))
+
+    def _choose(self, model):
+        """Pick a host for a model; the caller must hold the lock."""
+        candidates = [host for host, state in self.hosts.items() if state["healthy"]]
+        # With every host ejected, try them all rather than failing outright
+        candidates = candidates or list(self.hosts)
+
+        if model:
+            installed = [host for host in candidates
+                         if any(_model_matches(name, model) for name in self.hosts[host]["installed"])]
+            candidates = installed or candidates
+
+        def rank(host):
+            state = self.hosts[host]
+            loaded = model and any(_model_matches(name, model) for name in state["loaded"])
+            # A loaded host is only preferred while it has free slots
+            return (
+                0 if loaded and state["outstanding"] < self.slots else 1,
+                state["outstanding"],
+                state["latency"] if state["latency"] is not None else float("inf"),
+            )
+
+        return min(candidates, key=rank)
+
+    def pick(self, model=None):
+        """
+        Choose a host for a request without reserving it.
+
+        Args:
+            model (str): Model the request needs
+
+        Returns:
+            str: Host URL
+        """
+        with self.lock:
+            return self._choose(model)
+
+    @contextmanager
+    def acquire(self, model=None):
+        """
+        Reserve a host for one request.
+
+        The host counts the request as outstanding until the block exits.
+        Connection errors eject the host, so retries go elsewhere.
+
+        Args:
+            model (str): Model the request needs
+
+        Yields:
+            str: Host URL
+        """
+        with self.lock:
+            host = self._choose(model)
+            self.hosts[host]["outstanding"] += 1
+            self.hosts[host]["requests"] += 1
+
+        try:
+            yield host
+            if model:
+                # Ollama loaded the model to serve the request
+                with self.lock:
+                    self.hosts[host]["loaded"].add(model)
+        except CONNECTION_ERRORS as e:
+            self.mark_unhealthy(host, e)
+            raise
+        finally:
+            with self.lock:
+                self.hosts[host]["outstanding"] -= 1
+
+    def get_status(self):
+        """Return the health, queue depth and latency of every host."""
+        with self.lock:
+            return {
+                host: {**state, "installed": sorted(state["installed"]), "loaded": sorted(state["loaded"])}
+                for host, state in self.hosts.items()
+            }
+
+
+class AsyncClients:
+    """
+    Ollama AsyncClients for one event loop, created per host on first use.
+
+    Use as an async context manager, or await aclose(), so their connections
+    are closed on the loop that opened them instead of leaking with it.
+    """
+
+    def __init__(self):
+        self.clients = {}
+
+    def get(self, host):
+        if host not in self.clients:
+            self.clients[host] = create_async_client(host)
+        return self.clients[host]
+
+    async def aclose(self):
+        """Close the connections of every client created so far"""
+        clients, self.clients = list(self.clients.values()), {}
+        for client in clients:
+            # ollama.AsyncClient has no close method; its httpx client holds the connections
+            await client._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.aclose()
+
+
+@st.cache_resource
+def get_host_pool():
+    """Get or create the shared host pool with its health checks running"""
+    pool = HostPool()
+    pool.start()
+    return pool
@@ -0,0 +1,232 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.database import HistoryDatabase
+from utils.sqlite_pool import ConnectionPool
+from utils.Simplification import iter_simplification
+from utils.translation import TRANSLATION_LANGUAGES, StreamingTranslator
+
+# Worker threads that run inference jobs
+JOB_WORKERS = 2
+
+# Seconds between writes of partial output while a job is running
+JOB_FLUSH_INTERVAL = 0.5
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_COLUMNS = ("id", "kind", "status", "entry_id", "model", "input_text",
+               "partial_text", "result_text", "error", "clause_stats", "prefilter",
+               "translate_to", "partial_translation", "segments", "created", "updated")
+
+
+class JobQueue:
+    """SQLite-backed queue of simplification jobs run by a pool of worker threads"""
+
+    def __init__(self, history_db_path="./data/history.db", db_path="./data/jobs.db", workers=JOB_WORKERS):
+        # Workers share one history database; it hands each call its own connection
+        self.history_db = HistoryDatabase(history_db_path)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+
+        self.pool = ConnectionPool(db_path)
+        self.create_tables()
+        self.resume_jobs()
+
+    def create_tables(self):
+        """Create the necessary tables if they don't exist."""
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                entry_id INTEGER,
+                model TEXT NOT NULL,
+                input_text TEXT NOT NULL,
+                partial_text TEXT,
+                result_text TEXT,
+                error TEXT,
+                clause_stats TEXT,
+                prefilter INTEGER NOT NULL DEFAULT 0,
+                translate_to TEXT,
+                partial_translation TEXT,
+                segments TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS jobs_entry ON jobs (entry_id, status)
+            ''')
+
+            # Add columns missing from job tables created by earlier versions
+            cursor.execute('PRAGMA table_info(jobs)')
+            columns = {row[1] for row in cursor.fetchall()}
+            for name, definition in (("clause_stats", "TEXT"),
+                                     ("prefilter", "INTEGER NOT NULL DEFAULT 0"),
+                                     ("translate_to", "TEXT"),
+                                     ("partial_translation", "TEXT"),
+                                     ("segments", "TEXT")):
+                if name not in columns:
+                    cursor.execute(f'ALTER TABLE jobs ADD COLUMN {name} {definition}')
+
+    def resume_jobs(self):
+        """Requeue jobs that were unfinished when the previous process stopped."""
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY id
+            ''', (QUEUED, RUNNING))
+            job_ids = [row[0] for row in cursor.fetchall()]
+
+        for job_id in job_ids:
+            self._update(job_id, status=QUEUED, partial_text="", partial_translation="")
+            self.executor.submit(self._run, job_id)
+
+    def submit_simplification(self, entry_id, input_text, model, prefilter=False, translate_to=None,
+                              segments=None):
+        """
+        Queue a simplification of a history entry.
+
+        Args:
+            entry_id (int): History entry that receives the result
+            input_text (str): The legal text to simplify
+            model (str): Model name
+            prefilter (bool): Shrink the text with the extractive pre-filter first
+            translate_to (str): Language to translate into while the
+                simplification is generated, e.g. "Hindi"
+            segments (list): Segment strings of the text as found by the
+                extractor, used instead of splitting the text again
+
+        Returns:
+            int: The job ID
+        """
+        now = time.time()
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            INSERT INTO jobs (kind, status, entry_id, model, input_text, partial_text, prefilter,
+                              translate_to, segments, created, updated)
+            VALUES ('simplify', ?, ?, ?, ?, '', ?, ?, ?, ?, ?)
+            ''', (QUEUED, entry_id, model, input_text, int(prefilter), translate_to,
+                  json.dumps(segments) if segments else None, now, now))
+            job_id = cursor.lastrowid
+
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def get_job(self, job_id):
+        """Retrieve a job as a dictionary, or None if it does not exist."""
+        with self.pool.read() as cursor:
+            cursor.execute(f'''
+            SELECT {", ".join(JOB_COLUMNS)} FROM jobs WHERE id = ?
+            ''', (job_id,))
+            row = cursor.fetchone()
+        if not row:
+            return None
+
+        job = dict(zip(JOB_COLUMNS, row))
+        job["clause_stats"] = json.loads(job["clause_stats"]) if job["clause_stats"] else None
+        job["segments"] = json.loads(job["segments"]) if job["segments"] else None
+        return job
+
+    def get_active_job(self, entry_id):
+        """Retrieve the queued or running job of a history entry, if any."""
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT id FROM jobs WHERE entry_id = ? AND status IN (?, ?)
+            ORDER BY id DESC LIMIT 1
+            ''', (entry_id, QUEUED, RUNNING))
+            row = cursor.fetchone()
+        return self.get_job(row[0]) if row else None
+
+    def _update(self, job_id, **fields):
+        """Update job columns and its modification time."""
+        fields["updated"] = time.time()
+        with self.pool.write() as cursor:
+            cursor.execute(f'''
+            UPDATE jobs SET {", ".join(f"{name} = ?" for name in fields)}
+            WHERE id = ?
+            ''', (*fields.values(), job_id))
+
+    def _run(self, job_id):
+        """Run a job on a worker thread and store its result in the history database."""
+        job = self.get_job(job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return
+
+        self._update(job_id, status=RUNNING)
+
+        history_db = self.history_db
+        language = job["translate_to"]
+        translator = None
+        try:
+            previous_chunks = history_db.get_entry_chunks(job["entry_id"], job["model"])
+            chunk_records = []
+            clause_stats = {}
+            parts = []
+            last_flush = time.time()
+
+            if language:
+                # Paragraphs are translated while the rest of the summary is generated
+                translator = StreamingTranslator(TRANSLATION_LANGUAGES[language])
+
+            for part in iter_simplification(
+                job["input_text"],
+                model=job["model"],
+                previous_chunks=previous_chunks,
+                chunk_records=chunk_records,
+                clause_stats=clause_stats,
+                prefilter=bool(job["prefilter"]),
+                segments=job["segments"]
+            ):
+                parts.append(part)
+                if time.time() - last_flush >= JOB_FLUSH_INTERVAL:
+                    if translator:
+                        translator.feed("".join(parts))
+                        self._update(job_id, partial_text="".join(parts),
+                                     partial_translation=translator.partial())
+                    else:
+                        self._update(job_id, partial_text="".join(parts))
+                    last_flush = time.time()
+
+            simplified_text = "".join(parts)
+
+            # Finished jobs land in the history even if no session is watching
+            history_db.update_entry(
+                job["entry_id"],
+                simplified_text=simplified_text,
+                translated_text="",
+                input_text=job["input_text"]
+            )
+            # Translations of the previous simplification no longer apply
+            history_db.delete_translations(job["entry_id"])
+            if chunk_records:
+                history_db.replace_entry_chunks(job["entry_id"], job["model"], chunk_records)
+
+            # A failed translation leaves the finished simplification in place
+            translation_error = None
+            if translator:
+                try:
+                    translated_text = translator.finish(simplified_text)
+                    history_db.update_entry(job["entry_id"], translated_text=translated_text, language=language)
+                    history_db.save_translation(job["entry_id"], language, translated_text)
+                    self._update(job_id, partial_translation=translated_text)
+                except Exception as e:
+                    translation_error = f"Translation error: {str(e)}"
+
+            self._update(job_id, status=DONE, partial_text=simplified_text, result_text=simplified_text,
+                         clause_stats=json.dumps(clause_stats) if clause_stats else None,
+                         error=translation_error)
+
+        except Exception as e:
+            if translator:
+                translator.close()
+            self._update(job_id, status=FAILED, error=str(e))
+
+    def close(self):
+        """Stop the workers and close the database connections."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+        self.history_db.close()
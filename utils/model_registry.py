@@ -0,0 +1,180 @@
+import threading
+import time
+import streamlit as st
+from utils.ollama_config import ollama_get, ollama_post
+from utils.host_pool import get_host_pool
+from utils.token_budget import DEFAULT_CONTEXT_WINDOW, model_context_size
+
+# Seconds before the cached model list is refreshed
+MODEL_REGISTRY_TTL = 60
+
+
+def parse_model_tags(data):
+    """
+    Extract model metadata from an /api/tags response.
+
+    Args:
+        data: Decoded JSON, either {"models": [...]} or a bare list
+
+    Returns:
+        dict: Model name mapped to its metadata
+    """
+    entries = data.get("models", []) if isinstance(data, dict) else data
+    models = {}
+
+    for item in entries or []:
+        if isinstance(item, str):
+            models[item] = {"name": item}
+        elif isinstance(item, dict) and "name" in item:
+            details = item.get("details") or {}
+            models[item["name"]] = {
+                "name": item["name"],
+                "size": item.get("size"),
+                "digest": item.get("digest"),
+                "modified_at": item.get("modified_at"),
+                "family": details.get("family"),
+                "parameter_size": details.get("parameter_size"),
+                "quantization": details.get("quantization_level"),
+            }
+    return models
+
+
+class ModelRegistry:
+    """Caches the models installed in Ollama and refreshes them in the background"""
+
+    def __init__(self, ttl=MODEL_REGISTRY_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.models = {}
+        self.fetched_at = 0
+        self.error = None
+        self.refreshing = False
+        self.context_lengths = {}
+
+    def refresh(self):
+        """
+        Fetch the model list from Ollama, keeping the previous list on failure.
+
+        Models installed on any healthy host are listed, since the host pool
+        routes each request to a host that has its model.
+        """
+        try:
+            pool = get_host_pool()
+            models = {}
+            errors = []
+            for host in pool.healthy_hosts() or list(pool.hosts):
+                try:
+                    response = ollama_get("/api/tags", host)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"Ollama API returned status code: {response.status_code}")
+                    models.update(parse_model_tags(response.json()))
+                except Exception as e:
+                    errors.append(e)
+
+            if errors and not models:
+                raise errors[0]
+
+            with self.lock:
+                self.models = models
+                self.error = None
+        except Exception as e:
+            with self.lock:
+                self.error = str(e)
+        finally:
+            with self.lock:
+                self.fetched_at = time.time()
+                self.refreshing = False
+
+    def _refresh_in_background(self):
+        """Start a refresh thread unless one is already running."""
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def get_models(self):
+        """
+        Return installed models without waiting on Ollama once a list is cached.
+
+        The first call fetches synchronously. Later calls return the cached
+        list and start a background refresh when it is older than the TTL.
+
+        Returns:
+            dict: Model name mapped to its metadata
+        """
+        if not self.fetched_at:
+            self.refresh()
+        elif time.time() - self.fetched_at > self.ttl:
+            self._refresh_in_background()
+
+        with self.lock:
+            return dict(self.models)
+
+    def resolve(self, model):
+        """
+        Find the installed name for a model, accepting tagged variants.
+
+        Args:
+            model (str): Model name, with or without a tag
+
+        Returns:
+            str: Installed model name, or None if it is not installed
+        """
+        models = self.get_models()
+        if model in models:
+            return model
+
+        # Check if model without version tag is available
+        base_model = model.split(":")[0] if ":" in model else model
+        base_matches = [m for m in models if m.startswith(base_model)]
+        return base_matches[0] if base_matches else None
+
+    def get_context_length(self, model):
+        """
+        Get a model's context window from /api/show, cached per model.
+
+        Args:
+            model (str): Model name
+
+        Returns:
+            int: Context length in tokens, or None if Ollama does not report one
+        """
+        with self.lock:
+            if model in self.context_lengths:
+                return self.context_lengths[model]
+
+        context_length = None
+        try:
+            response = ollama_post("/api/show", {"model": model}, get_host_pool().pick(model))
+            if response.status_code == 200:
+                model_info = response.json().get("model_info") or {}
+                context_length = next(
+                    (value for key, value in model_info.items() if key.endswith(".context_length")),
+                    None
+                )
+        except Exception:
+            # Not cached, so the next request asks again
+            return None
+
+        with self.lock:
+            self.context_lengths[model] = context_length
+        return context_length
+
+    def get_num_ctx(self, model):
+        """
+        Get the num_ctx sent with every request to a model, so Ollama never reloads it.
+
+        Args:
+            model (str): Model name
+
+        Returns:
+            int: Context size from model_context_size
+        """
+        return model_context_size(self.get_context_length(model) or DEFAULT_CONTEXT_WINDOW)
+
+
+@st.cache_resource
+def get_model_registry():
+    """Get or create the shared model registry"""
+    return ModelRegistry()
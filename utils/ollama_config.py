@@ -1,4 +1,9 @@
+import os
+import httpx
+import ollama
+import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 # Available Ollama models
 AVAILABLE_MODELS = [
@@ -15,15 +20,81 @@ AVAILABLE_MODELS = [
 # Default model to use
 DEFAULT_MODEL = "deepseek-r1"
 
+# Model used for translation (Llama3 is typically better at multilingual tasks)
+TRANSLATION_MODEL = "llama3"
+
+# How long Ollama keeps a model loaded after its last request, per model
+DEFAULT_KEEP_ALIVE = "30m"
+MODEL_KEEP_ALIVE = {
+    "deepseek-r1": "30m",
+    "llama3": "30m",
+}
+
+# Keep the simplification and translation models loaded together. Requires
+# OLLAMA_MAX_LOADED_MODELS >= 2 and enough memory for both; when False the
+# translation model is unloaded right after use and the simplification model
+# is reloaded in the background.
+KEEP_MODELS_RESIDENT = os.environ.get("LDSS_KEEP_MODELS_RESIDENT", "1") == "1"
+
 # Ollama API endpoint (default is localhost)
 OLLAMA_API_HOST = "http://localhost:11434"
 
+# Ollama servers requests are balanced across, comma-separated in OLLAMA_API_HOSTS
+OLLAMA_API_HOSTS = [
+    host.strip().rstrip("/")
+    for host in os.environ.get("OLLAMA_API_HOSTS", OLLAMA_API_HOST).split(",")
+    if host.strip()
+]
+
+# Seconds between health probes of every Ollama host
+HOST_HEALTH_INTERVAL = 15
+
+# Seconds to wait for a connection to Ollama and for a model response
+OLLAMA_CONNECT_TIMEOUT = 5
+OLLAMA_READ_TIMEOUT = 600
+
+# Timeouts (connect, read) for metadata requests such as /api/tags
+HTTP_TIMEOUT = (OLLAMA_CONNECT_TIMEOUT, 10)
+
+# Keep-alive connections held open to Ollama
+HTTP_POOL_SIZE = 16
+
 # Template for system message
 SYSTEM_TEMPLATE = """You are an expert in summarization and legal document simplification. 
 Your task is to summarize the following agreement in a way that is easy for a layperson to understand. 
 The summary should include all key details while using simple, clear language and relevant real-life examples where needed. 
 Ensure that no critical information is lost."""
 
+# Token budget for each chunk of a long document
+CHUNK_TOKEN_BUDGET = 2000
+
+# Token budget documents are shrunk to when the extractive pre-filter is enabled
+PREFILTER_TOKEN_BUDGET = int(os.environ.get("LDSS_PREFILTER_TOKENS", 4000))
+
+# Maximum tokens generated for the simplification of a single chunk
+CHUNK_SUMMARY_TOKENS = 1024
+
+# Maximum chunk requests in flight, matching the server's OLLAMA_NUM_PARALLEL slots
+MAX_PARALLEL_REQUESTS = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+
+# Retries for a failed chunk request and the initial backoff between them (seconds)
+CHUNK_MAX_RETRIES = 2
+CHUNK_RETRY_BACKOFF = 1.0
+
+# Template for the system message when simplifying one part of a longer document
+CHUNK_TEMPLATE = """You are an expert in legal document simplification.
+You are given one part of a longer agreement.
+Explain this part in simple, clear language that a layperson can understand.
+Keep every obligation, party, amount, date and condition it mentions. Do not add an introduction or conclusion.
+The part is divided into clauses numbered [1], [2] and so on. Explain the clauses in order, starting the
+explanation of each clause on a new line with its number in square brackets."""
+
+# Template for the system message when combining simplified parts into one summary
+REDUCE_TEMPLATE = """You are an expert in summarization and legal document simplification.
+You are given plain-language explanations of consecutive parts of one agreement.
+Combine them into a single summary that is easy for a layperson to understand.
+Remove repetition, keep the order of the agreement and ensure that no critical information is lost."""
+
 # Get selected model from session state or use default
 
 
@@ -40,3 +111,74 @@ def set_selected_model(model_name):
         st.session_state.ollama_model = model_name
         return True
     return False
+
+
+def get_keep_alive(model):
+    """Get the keep_alive duration to send with requests for a model"""
+    return MODEL_KEEP_ALIVE.get(model.split(":")[0], DEFAULT_KEEP_ALIVE)
+
+
+def _ollama_client_options():
+    """Timeouts and connection limits shared by every Ollama client"""
+    return {
+        "timeout": httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE
+        ),
+    }
+
+
+@st.cache_resource
+def get_ollama_client(host=OLLAMA_API_HOST):
+    """Get the process-wide Ollama client for a host, with pooled keep-alive connections"""
+    return ollama.Client(host=host, **_ollama_client_options())
+
+
+def create_async_client(host=OLLAMA_API_HOST):
+    """
+    Create an Ollama AsyncClient for a host with the shared timeouts and limits.
+
+    Async connections belong to the event loop that opened them, so each
+    asyncio.run() needs its own client instead of a process-wide one.
+    """
+    return ollama.AsyncClient(host=host, **_ollama_client_options())
+
+
+@st.cache_resource
+def get_http_session():
+    """Get the process-wide HTTP session used for Ollama REST requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=len(OLLAMA_API_HOSTS), pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def ollama_get(path, host=OLLAMA_API_HOST):
+    """
+    Send a GET request to the Ollama REST API through the shared session.
+
+    Args:
+        path (str): API path such as "/api/tags"
+        host (str): Ollama server to send the request to
+
+    Returns:
+        requests.Response: The response
+    """
+    return get_http_session().get(f"{host}{path}", timeout=HTTP_TIMEOUT)
+
+
+def ollama_post(path, payload, host=OLLAMA_API_HOST):
+    """
+    Send a POST request to the Ollama REST API through the shared session.
+
+    Args:
+        path (str): API path such as "/api/show"
+        payload (dict): JSON body
+        host (str): Ollama server to send the request to
+
+    Returns:
+        requests.Response: The response
+    """
+    return get_http_session().post(f"{host}{path}", json=payload, timeout=HTTP_TIMEOUT)
@@ -0,0 +1,205 @@
+import math
+import re
+from collections import Counter, defaultdict
+from utils.chunking import CHARS_PER_TOKEN, CLAUSE_START_PATTERN, SENTENCE_BOUNDARY, estimate_tokens, split_into_segments
+
+# Short lines repeated at least this often are treated as page headers/footers
+REPEATED_LINE_MIN = 3
+REPEATED_LINE_MAX_CHARS = 80
+
+# Lines that are only a page number, e.g. "Page 3 of 12", "- 4 -" or "5"
+PAGE_NUMBER_PATTERN = re.compile(r"^\s*(?:page\s*)?[-–—]?\s*\d+\s*(?:of\s*\d+)?\s*[-–—]?\s*$", re.IGNORECASE)
+
+# First lines with at most this many words may be kept as clause headings
+HEADING_MAX_WORDS = 12
+
+# Largest share of the budget spent on clause headings; later headings are dropped
+HEADING_MAX_SHARE = 0.5
+
+# Characters charged for joining a kept heading or sentence to the text, the
+# longest separator used ("\n\n" between segments)
+JOINER_CHARS = 2
+
+# TextRank damping factor and iteration limits
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+CONVERGENCE = 1e-6
+
+# Terms found in more than this share of sentences carry no ranking signal
+MAX_TERM_SHARE = 0.5
+
+
+def strip_page_furniture(text):
+    """
+    Remove page numbers and headers/footers repeated on every page.
+
+    Lines are compared with digits masked, so "Page 1" and "Page 2" count
+    as the same footer. Clause headings are never removed.
+
+    Args:
+        text (str): The document text
+
+    Returns:
+        str: The text without page furniture
+    """
+    def mask(line):
+        return re.sub(r"\d+", "#", line.strip().lower())
+
+    lines = text.splitlines()
+    counts = Counter(mask(line) for line in lines
+                     if line.strip() and len(line.strip()) <= REPEATED_LINE_MAX_CHARS)
+
+    kept = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped and not CLAUSE_START_PATTERN.match(line) and (
+            PAGE_NUMBER_PATTERN.match(stripped)
+            or (len(stripped) <= REPEATED_LINE_MAX_CHARS and counts[mask(line)] >= REPEATED_LINE_MIN)
+        ):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def collapse_whitespace(text):
+    """Collapse runs of spaces and blank lines, keeping paragraph breaks"""
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _tokenize(sentence):
+    """Lowercase words used as TF-IDF terms"""
+    return [word for word in re.findall(r"[a-z]+", sentence.lower()) if len(word) > 2]
+
+
+def rank_sentences(sentences):
+    """
+    Score sentences by TextRank over their TF-IDF similarity graph.
+
+    With X the matrix of L2-normalized TF-IDF sentence vectors, the graph's
+    edge weights are X·Xᵀ without its diagonal. Each PageRank step computes
+    X·(Xᵀ·v) over the sparse rows of X instead of materializing the graph,
+    so the cost grows with the number of terms rather than sentence pairs.
+
+    Args:
+        sentences (list): Sentence strings
+
+    Returns:
+        list: One score per sentence; higher scores are more central
+    """
+    count = len(sentences)
+    if count <= 2:
+        return [1.0] * count
+
+    term_counts = [Counter(_tokenize(sentence)) for sentence in sentences]
+    document_frequency = Counter(term for counts in term_counts for term in counts)
+
+    # Sparse rows of X as (term, weight) pairs
+    rows = []
+    for counts in term_counts:
+        weights = {
+            term: tf * math.log(count / document_frequency[term])
+            for term, tf in counts.items()
+            if document_frequency[term] <= MAX_TERM_SHARE * count
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        rows.append([(term, weight / norm) for term, weight in weights.items()] if norm else [])
+
+    def multiply(vector):
+        """Compute (X·Xᵀ - I)·vector, skipping empty rows"""
+        column = defaultdict(float)
+        for row, value in zip(rows, vector):
+            if value:
+                for term, weight in row:
+                    column[term] += weight * value
+        return [sum(weight * column[term] for term, weight in row) - (value if row else 0)
+                for row, value in zip(rows, vector)]
+
+    # Total edge weight of each sentence, normalizing its outgoing votes
+    totals = multiply([1.0] * count)
+
+    # Power iteration of PageRank over the weighted graph
+    scores = [1.0 / count] * count
+    for _ in range(MAX_ITERATIONS):
+        votes = multiply([score / total if total > 1e-12 else 0.0
+                          for score, total in zip(scores, totals)])
+        updated = [(1 - DAMPING) / count + DAMPING * vote for vote in votes]
+        converged = sum(abs(a - b) for a, b in zip(updated, scores)) < CONVERGENCE
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def _split_heading(segment):
+    """Separate a clause heading line from the body of a segment."""
+    first, _, rest = segment.partition("\n")
+    is_heading = len(first.split()) <= HEADING_MAX_WORDS and (
+        CLAUSE_START_PATTERN.match(first) or first.isupper()
+    )
+    if is_heading:
+        return first.strip(), rest.strip()
+    return None, segment
+
+
+def prefilter_text(text, max_tokens):
+    """
+    Shrink a document before simplification.
+
+    Page furniture is removed and whitespace collapsed. If the text still
+    exceeds max_tokens, clause headings are kept in document order up to
+    HEADING_MAX_SHARE of the budget, and the most central sentences fill the
+    rest. Separators between the kept pieces count against the budget, so
+    the result never exceeds max_tokens.
+
+    Args:
+        text (str): The document text
+        max_tokens (int): Token budget for the filtered text
+
+    Returns:
+        str: The filtered text
+    """
+    text = collapse_whitespace(strip_page_furniture(text or ""))
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    segments = []
+    sentences = []
+    for segment in split_into_segments(text):
+        heading, body = _split_heading(segment)
+        body_sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(body) if s.strip()]
+        segments.append((heading, range(len(sentences), len(sentences) + len(body_sentences))))
+        sentences.extend(body_sentences)
+
+    # Counted in characters, each piece with the separator that joins it
+    budget = max_tokens * CHARS_PER_TOKEN
+
+    # Headings come first, in document order, up to their share of the budget
+    heading_budget = int(budget * HEADING_MAX_SHARE)
+    kept_headings = []
+    for heading, _ in segments:
+        cost = len(heading) + JOINER_CHARS if heading else 0
+        if heading and cost <= heading_budget:
+            heading_budget -= cost
+            budget -= cost
+            kept_headings.append(heading)
+        else:
+            kept_headings.append(None)
+
+    # Sentences fill the rest of the budget by score
+    scores = rank_sentences(sentences)
+    selected = set()
+    for i in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        cost = len(sentences[i]) + JOINER_CHARS
+        if cost <= budget:
+            selected.add(i)
+            budget -= cost
+
+    parts = []
+    for heading, (_, indices) in zip(kept_headings, segments):
+        body = " ".join(sentences[i] for i in indices if i in selected)
+        part = "\n".join(p for p in (heading, body) if p)
+        if part:
+            parts.append(part)
+    return "\n\n".join(parts)
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import streamlit as st
+from utils.sqlite_pool import BufferedCounters, ConnectionPool
+
+# Total size of cached results before least recently used entries are evicted
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Age after which cached results are evicted
+CACHE_MAX_AGE_DAYS = 90
+
+# Number of writes between eviction passes
+EVICT_EVERY = 50
+
+
+def normalize_text(text):
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class ResultCache:
+    """Disk-backed cache of model responses shared by every process using the same file"""
+
+    def __init__(self, db_path="./data/cache.db", max_bytes=CACHE_MAX_BYTES,
+                 max_age_days=CACHE_MAX_AGE_DAYS):
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.lock = threading.Lock()
+        self.writes = 0
+
+        # Hits update the LRU order and counters in batches, so lookups never take the write lock
+        self.counters = BufferedCounters("stats")
+        self.accessed = {}
+
+        self.pool = ConnectionPool(db_path)
+        self.create_tables()
+        self.evict()
+
+    def create_tables(self):
+        """Create the necessary tables if they don't exist."""
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            ''')
+            cursor.execute('''
+            INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0)
+            ''')
+
+    @staticmethod
+    def make_key(text, model, system_prompt, options):
+        """
+        Build the cache key for a request.
+
+        Args:
+            text (str): The user content, normalized before hashing
+            model (str): Model name
+            system_prompt (str): System prompt, so template changes invalidate entries
+            options (dict): Generation options
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        payload = json.dumps({
+            "text": normalize_text(text),
+            "model": model,
+            "prompt": hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+            "options": options,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached value for a key, or None on a miss."""
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT value, created FROM results WHERE key = ?
+            ''', (key,))
+            row = cursor.fetchone()
+        now = time.time()
+
+        hit = row is not None and now - row[1] <= self.max_age
+        if hit:
+            with self.lock:
+                self.accessed[key] = now
+        if self.counters.add("hits" if hit else "misses"):
+            self.flush()
+        return row[0] if hit else None
+
+    def flush(self):
+        """Write buffered access times and counters in one transaction."""
+        with self.lock:
+            accessed, self.accessed = self.accessed, {}
+        with self.pool.write() as cursor:
+            cursor.executemany('''
+            UPDATE results SET accessed = ? WHERE key = ?
+            ''', [(when, key) for key, when in accessed.items()])
+            self.counters.write(cursor)
+
+    def set(self, key, value):
+        """Store a value, evicting old entries periodically."""
+        now = time.time()
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            INSERT OR REPLACE INTO results (key, value, size, created, accessed)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (key, value, len(value.encode("utf-8")), now, now))
+        with self.lock:
+            self.writes += 1
+            due = self.writes % EVICT_EVERY == 0
+
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Remove expired entries, then least recently used ones above the size limit."""
+        self.flush()
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            DELETE FROM results WHERE created < ?
+            ''', (time.time() - self.max_age,))
+            cursor.execute('''
+            DELETE FROM results WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS running
+                    FROM results
+                )
+                WHERE running > ?
+            )
+            ''', (self.max_bytes,))
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self.pool.read() as cursor:
+            cursor.execute('SELECT name, value FROM stats')
+            stats = self.counters.merge(dict(cursor.fetchall()))
+            cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results')
+            stats["entries"], stats["bytes"] = cursor.fetchone()
+        return stats
+
+    def clear(self):
+        """Delete all cached results and reset the counters."""
+        self.counters.clear()
+        with self.lock:
+            self.accessed.clear()
+        with self.pool.write() as cursor:
+            cursor.execute('DELETE FROM results')
+            cursor.execute('UPDATE stats SET value = 0')
+
+    def close(self):
+        """Write buffered counters and close the database connections."""
+        self.flush()
+        self.pool.close()
+
+
+@st.cache_resource
+def get_result_cache():
+    """Get or create the shared result cache"""
+    return ResultCache()
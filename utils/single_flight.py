@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class LeaderAbandoned(Exception):
+    """Raised to waiting callers when the leader was cancelled or exited before finishing"""
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls so only one of them does the work.
+
+    The first caller for a key becomes the leader and runs the call; callers
+    arriving while it is in flight wait for the leader's result instead of
+    repeating the call. Works across threads and event loops.
+
+    Only errors raised by the call itself are shared. If the leader is
+    cancelled or its generator is closed, waiting callers retry the call
+    instead of failing with the leader's CancelledError or GeneratorExit.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def join(self, key):
+        """
+        Join the in-flight call for a key, or start one.
+
+        Returns:
+            tuple: (future, leader) where leader is True if the caller must
+                run the call and report it with finish()
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+
+            future = Future()
+            self.calls[key] = future
+            return future, True
+
+    def finish(self, key, result=None, error=None):
+        """Publish the leader's result, or error, to every waiting caller."""
+        with self.lock:
+            future = self.calls.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def abandon(self, key):
+        """Release a key whose leader stopped without a result, so waiting callers retry."""
+        with self.lock:
+            future = self.calls.pop(key)
+        future.set_exception(LeaderAbandoned(key))
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn once for all concurrent callers with the same key."""
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except LeaderAbandoned:
+                continue
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.finish(key, error=e)
+            raise
+        except BaseException:
+            self.abandon(key)
+            raise
+        self.finish(key, result)
+        return result
+
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        """Await coro_fn once for all concurrent callers with the same key."""
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                break
+            try:
+                # Shielded, so a cancelled caller does not cancel the call for everyone else
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except LeaderAbandoned:
+                continue
+
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except Exception as e:
+            self.finish(key, error=e)
+            raise
+        except BaseException:
+            self.abandon(key)
+            raise
+        self.finish(key, result)
+        return result
+
+
+# Shared by every session of this process
+inflight = SingleFlight()
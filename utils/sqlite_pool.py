@@ -0,0 +1,154 @@
+import os
+import queue
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Connections kept open per database file
+POOL_SIZE = 8
+
+# Seconds a statement waits for another connection's write lock before failing
+BUSY_TIMEOUT = 10.0
+
+# Counter updates buffered in memory before they are written
+STATS_FLUSH_EVERY = 50
+
+
+class ConnectionPool:
+    """
+    Pool of SQLite connections to one database file, shared by every thread.
+
+    Connections use WAL journaling, so readers never block the writer or
+    each other, with synchronous=NORMAL and a busy timeout so concurrent
+    writers wait for the lock instead of failing with "database is locked".
+    A connection is used by one thread at a time and every call gets its own
+    cursor, so rows and lastrowid never leak between sessions.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=BUSY_TIMEOUT):
+        # Ensure data directory exists
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_path = db_path
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def _connect(self):
+        """Open a connection in autocommit mode; transactions are started explicitly"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block, waiting if all are in use."""
+        with self.slots:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self.idle.put(conn)
+
+    @contextmanager
+    def read(self):
+        """Yield a cursor for reads; each statement sees the latest committed data."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def write(self):
+        """
+        Yield a cursor inside a write transaction.
+
+        The transaction takes the write lock up front, so it never fails
+        halfway through upgrading a read lock, and is committed when the
+        block ends or rolled back if it raises. Keep the block short: other
+        writers wait for it.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            else:
+                cursor.execute("COMMIT")
+            finally:
+                cursor.close()
+
+    def close(self):
+        """Close every connection of the pool."""
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+            self.idle = queue.LifoQueue()
+
+
+class BufferedCounters:
+    """
+    Counters of a (name, value) stats table, buffered in memory.
+
+    Counting every lookup in its own write transaction would make lookups
+    queue for the database write lock; increments are instead written
+    together once flush_every updates have accumulated, and when the owner
+    flushes or closes. Counts not yet written are lost if the process dies.
+    """
+
+    def __init__(self, table, flush_every=STATS_FLUSH_EVERY):
+        self.table = table
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.updates = 0
+
+    def add(self, name, amount=1):
+        """
+        Add to a counter.
+
+        Returns:
+            bool: True once enough updates are buffered that they should be written
+        """
+        with self.lock:
+            self.pending[name] += amount
+            self.updates += 1
+            return self.updates >= self.flush_every
+
+    def write(self, cursor):
+        """Write the buffered increments with a cursor inside a write transaction."""
+        with self.lock:
+            pending, self.pending, self.updates = self.pending, Counter(), 0
+        cursor.executemany(f"UPDATE {self.table} SET value = value + ? WHERE name = ?",
+                           [(value, name) for name, value in pending.items()])
+
+    def merge(self, stats):
+        """Add the increments not yet written to counters read from the table."""
+        with self.lock:
+            for name, value in self.pending.items():
+                stats[name] = stats.get(name, 0) + value
+        return stats
+
+    def clear(self):
+        """Drop the buffered increments, e.g. when the table is reset."""
+        with self.lock:
+            self.pending.clear()
+            self.updates = 0
@@ -0,0 +1,143 @@
+from utils.chunking import estimate_tokens
+from utils.ollama_config import CHUNK_TOKEN_BUDGET, CHUNK_SUMMARY_TOKENS, CHUNK_TEMPLATE
+
+# Context window assumed when Ollama does not report one for a model
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Largest num_ctx requested, bounding the KV cache on a shared server
+MAX_CONTEXT_WINDOW = 32768
+
+# Smallest num_ctx requested
+MIN_CONTEXT_WINDOW = 2048
+
+# Tokens added for the chat template around the messages
+PROMPT_OVERHEAD_TOKENS = 64
+
+# Margin on top of estimated prompt tokens, since the estimate is approximate
+ESTIMATE_MARGIN = 1.15
+
+# Output allowance beyond the prompt length, leaving room for reasoning models to think
+OUTPUT_BASE_TOKENS = 512
+
+# Smallest output a request must be able to produce
+MIN_PREDICT_TOKENS = 256
+
+# Smallest chunk budget worth sending
+MIN_CHUNK_TOKENS = 256
+
+
+class ContextOverflowError(ValueError):
+    """Raised when a prompt cannot fit in the model's context window"""
+
+
+def prompt_tokens(system_prompt, content):
+    """
+    Estimate the tokens a system/user exchange occupies in the context.
+
+    Args:
+        system_prompt (str): System message
+        content (str): User message
+
+    Returns:
+        int: Estimated prompt tokens, including a safety margin
+    """
+    return int((estimate_tokens(system_prompt) + estimate_tokens(content)) * ESTIMATE_MARGIN) \
+        + PROMPT_OVERHEAD_TOKENS
+
+
+def _context_bucket(tokens, context_window):
+    """Round a context size up to a power of two within the model's window"""
+    size = MIN_CONTEXT_WINDOW
+    while size < tokens:
+        size *= 2
+    return min(size, context_window, MAX_CONTEXT_WINDOW)
+
+
+def model_context_size(context_window):
+    """
+    Get the num_ctx every request to a model is sent with.
+
+    Ollama reloads a model whenever num_ctx changes, so map, reduce,
+    translation and warm-up requests share one size: room for a full chunk
+    and its simplification. Only prompts that do not fit ask for more.
+
+    Args:
+        context_window (int): The model's context window
+
+    Returns:
+        int: num_ctx for the model
+    """
+    window = min(context_window, MAX_CONTEXT_WINDOW)
+    try:
+        budget = chunk_token_budget(context_window)
+    except ContextOverflowError:
+        return window
+    chunk_prompt = int((budget + estimate_tokens(CHUNK_TEMPLATE)) * ESTIMATE_MARGIN) + PROMPT_OVERHEAD_TOKENS
+    return _context_bucket(chunk_prompt + CHUNK_SUMMARY_TOKENS, window)
+
+
+def generation_options(system_prompt, content, max_tokens, context_window, grow=False):
+    """
+    Size num_predict for a request from its input length.
+
+    num_ctx stays at model_context_size so the model is never reloaded,
+    unless the prompt leaves less than MIN_PREDICT_TOKENS of it for the
+    response, or grow is set and max_tokens does not fit.
+
+    Args:
+        system_prompt (str): System message
+        content (str): User message
+        max_tokens (int): Upper limit for generated tokens
+        context_window (int): The model's context window
+        grow (bool): Use a larger num_ctx so the response may use max_tokens,
+            as far as the window allows; for the final request of a
+            document, whose output the user reads
+
+    Returns:
+        dict: Ollama generation options
+
+    Raises:
+        ContextOverflowError: If the prompt leaves no room for a response
+    """
+    needed = prompt_tokens(system_prompt, content)
+    window = min(context_window, MAX_CONTEXT_WINDOW)
+
+    if window - needed < MIN_PREDICT_TOKENS:
+        raise ContextOverflowError(
+            f"The input needs about {needed} tokens but the model's context window is "
+            f"{window} tokens. Split the document into smaller parts."
+        )
+
+    wanted = max_tokens if grow else min(max_tokens, OUTPUT_BASE_TOKENS + needed)
+    num_ctx = model_context_size(context_window)
+    if num_ctx - needed < (wanted if grow else MIN_PREDICT_TOKENS):
+        num_ctx = _context_bucket(needed + wanted, window)
+    return {
+        "num_ctx": num_ctx,
+        "num_predict": min(wanted, num_ctx - needed),
+        "temperature": 0.1  # Low temperature for more deterministic output
+    }
+
+
+def chunk_token_budget(context_window):
+    """
+    Get the chunk size that fits the model's context window.
+
+    Args:
+        context_window (int): The model's context window
+
+    Returns:
+        int: Token budget per chunk, at most CHUNK_TOKEN_BUDGET
+
+    Raises:
+        ContextOverflowError: If the window cannot hold even a small chunk
+    """
+    window = min(context_window, MAX_CONTEXT_WINDOW)
+    room = int((window - CHUNK_SUMMARY_TOKENS - PROMPT_OVERHEAD_TOKENS) / ESTIMATE_MARGIN) \
+        - estimate_tokens(CHUNK_TEMPLATE)
+
+    if room < MIN_CHUNK_TOKENS:
+        raise ContextOverflowError(
+            f"The model's context window of {window} tokens is too small to simplify documents."
+        )
+    return min(CHUNK_TOKEN_BUDGET, room)
@@ -1,75 +1,283 @@
-import ollama
+import re
+import hashlib
+import threading
 import streamlit as st
 import asyncio
-from utils.ollama_config import OLLAMA_API_HOST
+from utils.single_flight import inflight
+from utils.host_pool import AsyncClients, get_host_pool
+from utils.model_registry import get_model_registry
+from utils.translation_memory import get_translation_memory
+from utils.ollama_config import (
+    get_keep_alive,
+    KEEP_MODELS_RESIDENT,
+    TRANSLATION_MODEL,
+)
+from utils.warmup import get_model_warmup
 
+# Languages offered for translation, mapped to their language codes
+TRANSLATION_LANGUAGES = {
+    "Hindi": "hi",
+    "Marathi": "mr",
+}
 
-async def translate_text(text, src="en", dest="hi"):
+
+def split_paragraphs(text):
+    """Split text on blank lines into the paragraphs translated one per request"""
+    return [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text or "") if paragraph.strip()]
+
+
+def _clean_translation(translated_text, target_language):
+    """Clean up any prefixes the model might add"""
+    prefixes = [
+        f"Here's the translation to {target_language}:",
+        f"Translation to {target_language}:",
+        f"{target_language} translation:",
+        f"Translated text in {target_language}:"
+    ]
+
+    translated_text = translated_text.strip()
+    for prefix in prefixes:
+        if translated_text.startswith(prefix):
+            translated_text = translated_text[len(prefix):].strip()
+    return translated_text
+
+
+async def _translate_paragraph(clients, semaphore, paragraph, dest, target_language, model, keep_alive):
+    """
+    Translate one paragraph.
+
+    Paragraphs found in the translation memory, exactly or as a close
+    match, are returned without a request; identical requests already in
+    flight are shared.
+    """
+    memory = get_translation_memory()
+    match = memory.lookup(paragraph, dest, model)
+    if match:
+        return match[0]
+
+    # Prepare prompt for translation
+    prompt = f"""Translate the following text from English to {target_language}.
+        Maintain the meaning, tone, and style as much as possible.
+        Only return the translated text, without any additional explanations.
+
+        Text to translate:
+        {paragraph}
+        """
+
+    async def request():
+        async with semaphore:
+            # Send the request to the least busy host that serves the model
+            with get_host_pool().acquire(model) as host:
+                return await clients.get(host).chat(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    options={
+                        # Same num_ctx as the warm-up, so the model is not reloaded
+                        "num_ctx": get_model_registry().get_num_ctx(model),
+                        "temperature": 0.2  # Slightly higher temperature for translation
+                    },
+                    keep_alive=keep_alive
+                )
+
+    # Identical translations already in flight in other sessions are shared
+    key = hashlib.sha256(f"translate\0{model}\0{prompt}".encode("utf-8")).hexdigest()
+    response = await inflight.do_async(key, request)
+    translated_text = _clean_translation(response["message"]["content"], target_language)
+    memory.add(paragraph, translated_text, dest, model)
+    return translated_text
+
+
+def _language_name(dest):
+    """Map a language code to its full name for better model understanding"""
+    language_map = {
+        "hi": "Hindi",
+        "mr": "Marathi",
+        "en": "English"
+    }
+    return language_map.get(dest, dest)
+
+
+def _keep_alive(model):
+    """Without room for both models, unload the translation model right after use"""
+    return get_keep_alive(model) if KEEP_MODELS_RESIDENT else 0
+
+
+async def translate_text(text, src="en", dest="hi", max_parallel=None, raise_errors=False):
     """
     Translates text using Ollama.
 
+    The text is split into paragraphs that are translated concurrently and
+    reassembled in their original order, so a long summary takes about as
+    long as its longest paragraph. Paragraphs translated before are served
+    from the translation memory.
+
     Args:
         text (str): Text to translate
         src (str): Source language code
         dest (str): Destination language code
+        max_parallel (int): Maximum requests in flight, defaults to the
+            MAX_PARALLEL_REQUESTS slots of every healthy host
+        raise_errors (bool): Raise failures instead of showing them and
+            returning an error message in place of the translation
 
     Returns:
         str: Translated text
     """
-    # Map language codes to full names for better model understanding
-    language_map = {
-        "hi": "Hindi",
-        "mr": "Marathi",
-        "en": "English"
-    }
-
-    target_language = language_map.get(dest, dest)
+    target_language = _language_name(dest)
 
     try:
-        # Set up the client
-        client = ollama.Client(host=OLLAMA_API_HOST)
+        # Use a more capable model for translation
+        model = TRANSLATION_MODEL
+        keep_alive = _keep_alive(model)
 
-        # Prepare prompt for translation
-        prompt = f"""Translate the following text from English to {target_language}.
-        Maintain the meaning, tone, and style as much as possible.
-        Only return the translated text, without any additional explanations.
-        
-        Text to translate:
-        {text}
-        """
+        # Clients are created per host as the pool routes requests to them
+        semaphore = asyncio.Semaphore(max_parallel or get_host_pool().capacity())
+        async with AsyncClients() as clients:
+            translations = await asyncio.gather(*[
+                _translate_paragraph(clients, semaphore, paragraph, dest, target_language, model, keep_alive)
+                for paragraph in split_paragraphs(text)
+            ])
 
-        # Use a more capable model for translation
-        model = "llama3"  # Llama3 is typically better at multilingual tasks
-
-        response = client.chat(
-            model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            options={
-                "temperature": 0.2  # Slightly higher temperature for translation
-            }
-        )
-
-        translated_text = response["message"]["content"]
-
-        # Clean up any prefixes the model might add
-        prefixes = [
-            f"Here's the translation to {target_language}:",
-            f"Translation to {target_language}:",
-            f"{target_language} translation:",
-            f"Translated text in {target_language}:"
-        ]
-
-        for prefix in prefixes:
-            if translated_text.startswith(prefix):
-                translated_text = translated_text[len(prefix):].strip()
-
-        return translated_text
+        if not KEEP_MODELS_RESIDENT:
+            # The simplification model may have been evicted; reload it on the next run
+            get_model_warmup().invalidate()
+
+        return "\n\n".join(translations)
 
     except Exception as e:
+        if raise_errors:
+            raise
         st.error(f"Translation error: {str(e)}")
         return f"Error in translation: {str(e)}"
+
+
+async def translate_to_languages(text, dest_codes, src="en", raise_errors=False):
+    """
+    Translate text into several languages at the same time.
+
+    Every language is translated concurrently, so translating into all
+    languages takes about as long as the slowest one.
+
+    Args:
+        text (str): Text to translate
+        dest_codes (list): Destination language codes
+        src (str): Source language code
+        raise_errors (bool): Raise the first failure instead of returning an
+            error message as that language's translation
+
+    Returns:
+        dict: Translated text keyed by language code
+    """
+    translations = await asyncio.gather(*[
+        translate_text(text, src=src, dest=dest, raise_errors=raise_errors) for dest in dest_codes
+    ])
+    return dict(zip(dest_codes, translations))
+
+
+def _visible_paragraphs(text):
+    """Paragraphs of generated text, leaving out reasoning and any unclosed <think> block"""
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+    return split_paragraphs(text.split("<think>")[0])
+
+
+class StreamingTranslator:
+    """
+    Translates text paragraph by paragraph while it is still being generated.
+
+    Each paragraph is sent for translation as soon as the next one starts,
+    so translation overlaps generation and finishes shortly after it.
+    Requests run on an event loop in a background thread.
+    """
+
+    def __init__(self, dest, max_parallel=None):
+        self.dest = dest
+        self.target_language = _language_name(dest)
+        self.model = TRANSLATION_MODEL
+        self.keep_alive = _keep_alive(self.model)
+        self.max_parallel = max_parallel or get_host_pool().capacity()
+        self.futures = []
+        self.closed = False
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run_loop, daemon=True).start()
+        self.clients = AsyncClients()
+        self.semaphore = asyncio.run_coroutine_threadsafe(self._create_semaphore(), self.loop).result()
+
+    def _run_loop(self):
+        self.loop.run_forever()
+        self.loop.close()
+
+    async def _create_semaphore(self):
+        return asyncio.Semaphore(self.max_parallel)
+
+    def _submit(self, paragraphs):
+        """Start translating paragraphs that were not submitted yet."""
+        for paragraph in paragraphs[len(self.futures):]:
+            self.futures.append(asyncio.run_coroutine_threadsafe(
+                _translate_paragraph(self.clients, self.semaphore, paragraph, self.dest,
+                                     self.target_language, self.model, self.keep_alive),
+                self.loop
+            ))
+
+    def feed(self, text):
+        """
+        Translate the paragraphs of the text generated so far.
+
+        Args:
+            text (str): Everything generated so far; the last paragraph is
+                held back because it may still grow
+        """
+        self._submit(_visible_paragraphs(text)[:-1])
+
+    def partial(self):
+        """Return the translated paragraphs finished so far, in order."""
+        done = []
+        for future in self.futures:
+            if not future.done() or future.exception():
+                break
+            done.append(future.result())
+        return "\n\n".join(done)
+
+    def finish(self, text):
+        """
+        Translate the rest of the finished text and wait for every paragraph.
+
+        Args:
+            text (str): The complete generated text
+
+        Returns:
+            str: The translated text
+
+        Raises:
+            Exception: The first error of any paragraph translation
+        """
+        try:
+            self._submit(_visible_paragraphs(text))
+            return "\n\n".join(future.result() for future in self.futures)
+        finally:
+            self.close()
+
+            if not KEEP_MODELS_RESIDENT:
+                # The simplification model may have been evicted; reload it on the next run
+                get_model_warmup().invalidate()
+
+    async def _shutdown(self):
+        """Wait for cancelled paragraphs to unwind, then close the clients on this loop."""
+        others = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*others, return_exceptions=True)
+        await self.clients.aclose()
+
+    def close(self):
+        """Cancel outstanding paragraphs, close the clients and stop the event loop."""
+        if self.closed:
+            return
+        self.closed = True
+        for future in self.futures:
+            future.cancel()
+        shutdown = asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        shutdown.add_done_callback(lambda _: self.loop.call_soon_threadsafe(self.loop.stop))
@@ -0,0 +1,167 @@
+import hashlib
+import time
+from difflib import SequenceMatcher
+import streamlit as st
+from utils.result_cache import normalize_text
+from utils.clause_index import key_terms
+from utils.sqlite_pool import BufferedCounters, ConnectionPool
+
+# Similarity ratio above which a stored translation of a different segment is reused
+FUZZY_MATCH_THRESHOLD = 0.92
+
+# Largest relative length difference between a segment and a fuzzy match candidate
+FUZZY_LENGTH_TOLERANCE = 0.1
+
+# Candidates compared per fuzzy lookup, closest in length first
+FUZZY_MAX_CANDIDATES = 200
+
+
+class TranslationMemory:
+    """
+    SQLite store of translated segments keyed by (source hash, language, model).
+
+    Exact matches are found by hash. Fuzzy matches are segments of similar
+    length whose character similarity reaches the threshold; numbers,
+    capitalized names, negations and modal words must be identical, so a
+    segment with a different amount, date, party or obligation is always
+    translated again.
+    """
+
+    def __init__(self, db_path="./data/translation_memory.db", threshold=FUZZY_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.pool = ConnectionPool(db_path)
+        # Lookups are counted in memory and written in batches, so they never take the write lock
+        self.counters = BufferedCounters("stats")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the necessary tables if they don't exist."""
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS segments (
+                source_hash TEXT NOT NULL,
+                language TEXT NOT NULL,
+                model TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (source_hash, language, model)
+            )
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS segments_length ON segments (language, model, length)
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            ''')
+            cursor.execute('''
+            INSERT OR IGNORE INTO stats (name, value)
+            VALUES ('exact', 0), ('fuzzy', 0), ('misses', 0)
+            ''')
+
+    @staticmethod
+    def _source_hash(text):
+        """Hash a segment, ignoring differences in whitespace"""
+        return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+    def lookup(self, source_text, language, model):
+        """
+        Find a stored translation of a segment.
+
+        Args:
+            source_text (str): Segment to translate
+            language (str): Target language code
+            model (str): Translation model
+
+        Returns:
+            tuple: (translated_text, similarity), where similarity is 1.0 for
+                exact matches, or None if nothing matches
+        """
+        normalized = normalize_text(source_text)
+        length = len(normalized)
+        with self.pool.read() as cursor:
+            cursor.execute('''
+            SELECT translated_text FROM segments
+            WHERE source_hash = ? AND language = ? AND model = ?
+            ''', (self._source_hash(source_text), language, model))
+            row = cursor.fetchone()
+            if not row:
+                cursor.execute('''
+                SELECT source_text, translated_text FROM segments
+                WHERE language = ? AND model = ? AND length BETWEEN ? AND ?
+                ORDER BY ABS(length - ?)
+                LIMIT ?
+                ''', (language, model, int(length * (1 - FUZZY_LENGTH_TOLERANCE)),
+                      int(length * (1 + FUZZY_LENGTH_TOLERANCE)) + 1, length, FUZZY_MAX_CANDIDATES))
+                candidates = cursor.fetchall()
+
+        if row:
+            self._count("exact")
+            return row[0], 1.0
+
+        best = None
+        terms = key_terms(source_text)
+        for candidate_text, translated_text in candidates:
+            matcher = SequenceMatcher(None, normalized, normalize_text(candidate_text), autojunk=False)
+            similarity = self.threshold if best is None else best[1]
+            # The quick ratios are upper bounds of ratio(), so most candidates stop early
+            if matcher.real_quick_ratio() < similarity or matcher.quick_ratio() < similarity:
+                continue
+            ratio = matcher.ratio()
+            # A one-word change such as "not" keeps the ratio high but reverses the meaning
+            if ratio >= similarity and key_terms(candidate_text) == terms:
+                best = (translated_text, ratio)
+
+        self._count("fuzzy" if best else "misses")
+        return best
+
+    def add(self, source_text, translated_text, language, model):
+        """Store the translation of a segment."""
+        with self.pool.write() as cursor:
+            cursor.execute('''
+            INSERT OR REPLACE INTO segments
+                (source_hash, language, model, source_text, translated_text, length, created)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (self._source_hash(source_text), language, model, source_text, translated_text,
+                  len(normalize_text(source_text)), time.time()))
+
+    def _count(self, name):
+        """Increment a lookup counter, writing the counters in batches."""
+        if self.counters.add(name):
+            self.flush()
+
+    def flush(self):
+        """Write the buffered lookup counters."""
+        with self.pool.write() as cursor:
+            self.counters.write(cursor)
+
+    def stats(self):
+        """Return exact/fuzzy/miss counters and the number of stored segments."""
+        with self.pool.read() as cursor:
+            cursor.execute('SELECT name, value FROM stats')
+            stats = self.counters.merge(dict(cursor.fetchall()))
+            cursor.execute('SELECT COUNT(*) FROM segments')
+            stats["segments"] = cursor.fetchone()[0]
+        return stats
+
+    def clear(self):
+        """Delete all stored translations and reset the counters."""
+        self.counters.clear()
+        with self.pool.write() as cursor:
+            cursor.execute('DELETE FROM segments')
+            cursor.execute('UPDATE stats SET value = 0')
+
+    def close(self):
+        """Write buffered counters and close the database connections."""
+        self.flush()
+        self.pool.close()
+
+
+@st.cache_resource
+def get_translation_memory():
+    """Get or create the shared translation memory"""
+    return TranslationMemory()
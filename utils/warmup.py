@@ -0,0 +1,94 @@
+import threading
+import time
+import streamlit as st
+from utils.ollama_config import get_ollama_client, get_keep_alive
+from utils.host_pool import get_host_pool
+from utils.model_registry import get_model_registry
+
+# Seconds after which a warmed model is pinged again, refreshing its keep_alive
+REWARM_INTERVAL = 5 * 60
+
+
+class ModelWarmup:
+    """Preloads Ollama models in the background and records their load times"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.status = {}
+
+    def warm_up(self, model, keep_alive=None):
+        """
+        Load a model into Ollama and keep it resident.
+
+        An empty prompt makes Ollama load the model without generating
+        anything, so the time taken is the model's cold-start latency. The
+        model is loaded on the host the pool would route it to, with the
+        num_ctx later requests use, so they find it already resident there.
+
+        Args:
+            model (str): Model name
+            keep_alive: How long Ollama keeps the model loaded, defaults to get_keep_alive(model)
+        """
+        with self.lock:
+            self.status[model] = {**self.status.get(model, {}), "state": "loading"}
+
+        started = time.time()
+        try:
+            with get_host_pool().acquire(model) as host:
+                get_ollama_client(host).generate(
+                    model=model,
+                    prompt="",
+                    options={"num_ctx": get_model_registry().get_num_ctx(model)},
+                    keep_alive=keep_alive if keep_alive is not None else get_keep_alive(model)
+                )
+            status = {"state": "ready", "seconds": time.time() - started,
+                      "loaded_at": time.time(), "error": None}
+        except Exception as e:
+            status = {"state": "failed", "seconds": None, "loaded_at": time.time(), "error": str(e)}
+
+        with self.lock:
+            # Keep the first cold-start time; later pings only refresh keep_alive
+            previous = self.status.get(model, {})
+            if status["state"] == "ready" and previous.get("cold_start") is not None:
+                status["cold_start"] = previous["cold_start"]
+            else:
+                status["cold_start"] = status["seconds"]
+            self.status[model] = status
+
+    def warm_up_in_background(self, models):
+        """Warm up models that are not loading and were not warmed recently."""
+        now = time.time()
+        pending = []
+        with self.lock:
+            for model in models:
+                status = self.status.get(model, {})
+                if status.get("state") == "loading":
+                    continue
+                if now - status.get("loaded_at", 0) < REWARM_INTERVAL:
+                    continue
+                self.status[model] = {**status, "state": "loading"}
+                pending.append(model)
+
+        if pending:
+            # Load one model after the other so they don't compete for memory
+            threading.Thread(
+                target=lambda: [self.warm_up(model) for model in pending],
+                daemon=True
+            ).start()
+
+    def invalidate(self):
+        """Forget load times so every model is warmed again on the next request."""
+        with self.lock:
+            for status in self.status.values():
+                status["loaded_at"] = 0
+
+    def get_status(self):
+        """Return the warm-up state of every model seen so far."""
+        with self.lock:
+            return {model: dict(status) for model, status in self.status.items()}
+
+
+@st.cache_resource
+def get_model_warmup():
+    """Get or create the shared model warm-up manager"""
+    return ModelWarmup()